@@ -1,40 +1,214 @@
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.exceptions import InvalidSignature, InvalidTag
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.hmac import HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from pathlib import Path
+import json
 import os
 import base64
+import secrets
+
+try:
+    # C binding that reuses the HMAC ipad/opad SHA-256 midstates across iterations
+    from fastpbkdf2 import pbkdf2_hmac as _fast_pbkdf2_hmac
+except ImportError:  # fastpbkdf2 is optional, fall back to cryptography/OpenSSL
+    _fast_pbkdf2_hmac = None
+
+NONCE_SIZE = 12
+TAG_SIZE = 16
+FILE_CHUNK_SIZE = 1 << 20
+# AAD marking "more frames follow"; the final frame of a file uses empty AAD, so a
+# single-frame file is exactly what encrypt_data produces and truncation is detected
+_MORE_FRAMES_AAD = b'\x00'
+PBKDF2_ITERATIONS = 600000  # OWASP 2023 recommendation for PBKDF2-HMAC-SHA256
+KDF_NAME = "pbkdf2-sha256"
+
+# getrandom(2) is Linux-only; it skips the /dev/urandom file descriptor that
+# os.urandom may go through
+_getrandom = getattr(os, 'getrandom', None)
+
+def _random_bytes(size: int) -> bytes:
+    """Return size bytes from the kernel CSPRNG for salts, nonces and keys"""
+    if _getrandom:
+        try:
+            return _getrandom(size, os.GRND_NONBLOCK)
+        except BlockingIOError:  # entropy pool not initialised yet (early boot)
+            pass
+    return secrets.token_bytes(size)
+
+def _derive_key_fast(password: bytes, salt: bytes, iterations: int) -> bytes:
+    """Run PBKDF2-HMAC-SHA256 for a 32-byte key with the fastest backend available"""
+    if _fast_pbkdf2_hmac:
+        return _fast_pbkdf2_hmac('sha256', password, salt, iterations, 32)
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=iterations,
+    )
+    return kdf.derive(password)
+
+class _LegacyFernet(Fernet):
+    """Fernet reader that keys HMAC-SHA256 once and copies the keyed state per token
+
+    Copying the keyed HMAC reuses the ipad/opad midstates instead of rehashing
+    the signing key for every legacy record.
+    """
+
+    def __init__(self, key: bytes):
+        super().__init__(key)
+        self._keyed_hmac = HMAC(self._signing_key, hashes.SHA256())
+
+    def _verify_signature(self, data: bytes) -> None:
+        h = self._keyed_hmac.copy()
+        h.update(memoryview(data)[:-32])
+        try:
+            h.verify(data[-32:])
+        except InvalidSignature:
+            raise InvalidToken
 
 class EncryptionEngine:
-    def __init__(self, password: str = None):
-        if password:
+    def __init__(self, password: str = None, fernet_compat: bool = True,
+                 keyfile_path: str = None):
+        if password and keyfile_path:
+            self.key = self.load_or_derive(password, keyfile_path)
+        elif password:
             self.key = self._derive_key(password)
         else:
-            self.key = Fernet.generate_key()
-        self.cipher = Fernet(self.key)
-    
-    def _derive_key(self, password: str, salt: bytes = None) -> bytes:
+            self.key = base64.urlsafe_b64encode(_random_bytes(32))
+        self._init_ciphers(fernet_compat)
+
+    @classmethod
+    def from_raw_key(cls, raw_key: bytes, fernet_compat: bool = True) -> 'EncryptionEngine':
+        """Build an engine around an existing 32-byte key, skipping key derivation"""
+        if len(raw_key) != 32:
+            raise ValueError("raw_key must be 32 bytes")
+        engine = cls.__new__(cls)
+        engine.key = base64.urlsafe_b64encode(raw_key)
+        engine._init_ciphers(fernet_compat)
+        return engine
+
+    def _init_ciphers(self, fernet_compat: bool):
+        # AES-256-GCM over the raw key: nonce || ciphertext || tag, no base64
+        self.cipher = AESGCM(base64.urlsafe_b64decode(self.key))
+        # Fernet is only kept around to read data written by older versions
+        self.fernet_compat = fernet_compat
+        self._fernet = _LegacyFernet(self.key) if fernet_compat else None
+
+    def load_or_derive(self, password: str, keyfile_path: str) -> bytes:
+        """Derive the key using the KDF parameters stored in keyfile_path.
+
+        The keyfile only holds {salt_b64, iterations, kdf}; the derived key
+        itself is never written to disk. A missing keyfile is created with a
+        fresh salt and the current iteration count, while existing keyfiles
+        keep the iteration count they were created with.
+        """
+        keyfile = Path(keyfile_path)
+        if keyfile.exists():
+            with open(keyfile, 'r') as f:
+                params = json.load(f)
+            if params.get('kdf') != KDF_NAME:
+                raise ValueError(f"Unsupported KDF in {keyfile}: {params.get('kdf')}")
+            salt = base64.b64decode(params['salt_b64'])
+            iterations = params['iterations']
+        else:
+            salt = _random_bytes(16)
+            iterations = PBKDF2_ITERATIONS
+            keyfile.parent.mkdir(parents=True, exist_ok=True)
+            with open(keyfile, 'w') as f:
+                json.dump({
+                    'salt_b64': base64.b64encode(salt).decode(),
+                    'iterations': iterations,
+                    'kdf': KDF_NAME
+                }, f, indent=2)
+
+        return self._derive_key(password, salt, iterations)
+
+    def _derive_key(self, password: str, salt: bytes = None,
+                    iterations: int = PBKDF2_ITERATIONS) -> bytes:
         if salt is None:
-            salt = os.urandom(16)
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return key
-    
+            salt = _random_bytes(16)
+        return base64.urlsafe_b64encode(_derive_key_fast(password.encode(), salt, iterations))
+
     def encrypt_data(self, data: bytes) -> bytes:
-        return self.cipher.encrypt(data)
-    
+        nonce = _random_bytes(NONCE_SIZE)
+        return nonce + self.cipher.encrypt(nonce, data, None)
+
     def decrypt_data(self, encrypted_data: bytes) -> bytes:
-        return self.cipher.decrypt(encrypted_data)
-    
+        try:
+            return self.cipher.decrypt(
+                encrypted_data[:NONCE_SIZE], encrypted_data[NONCE_SIZE:], None
+            )
+        except (InvalidTag, ValueError):
+            if not self._fernet:
+                raise
+            # Legacy Fernet token written before the switch to AES-GCM
+            try:
+                return self._fernet.decrypt(encrypted_data)
+            except InvalidToken:
+                raise InvalidTag("Decryption failed: invalid key or corrupted data")
+
     def encrypt_file(self, filepath: str) -> str:
-        with open(filepath, 'rb') as file:
-            data = file.read()
-        encrypted_data = self.encrypt_data(data)
+        """Encrypt a file as a stream of AES-GCM frames, one FILE_CHUNK_SIZE chunk at a time
+
+        Each frame is nonce || ciphertext || tag. Nonces are a random per-file
+        prefix followed by the big-endian frame index.
+        """
         encrypted_filepath = f"{filepath}.encrypted"
-        with open(encrypted_filepath, 'wb') as file:
-            file.write(encrypted_data)
+        nonce_prefix = _random_bytes(NONCE_SIZE - 4)
+        with open(filepath, 'rb') as src, open(encrypted_filepath, 'wb') as dst:
+            counter = 0
+            chunk = src.read(FILE_CHUNK_SIZE)
+            while True:
+                next_chunk = src.read(FILE_CHUNK_SIZE)
+                nonce = nonce_prefix + counter.to_bytes(4, 'big')
+                aad = _MORE_FRAMES_AAD if next_chunk else None
+                dst.write(nonce + self.cipher.encrypt(nonce, chunk, aad))
+                if not next_chunk:
+                    break
+                chunk = next_chunk
+                counter += 1
         return encrypted_filepath
+
+    def decrypt_file(self, encrypted_filepath: str, output_filepath: str = None) -> str:
+        """Decrypt a file written by encrypt_file without loading it into memory"""
+        if output_filepath is None:
+            if encrypted_filepath.endswith('.encrypted'):
+                output_filepath = encrypted_filepath[:-len('.encrypted')]
+            else:
+                output_filepath = f"{encrypted_filepath}.decrypted"
+
+        frame_size = NONCE_SIZE + FILE_CHUNK_SIZE + TAG_SIZE
+        try:
+            with open(encrypted_filepath, 'rb') as src, open(output_filepath, 'wb') as dst:
+                counter = 0
+                frame = src.read(frame_size)
+                nonce_prefix = frame[:NONCE_SIZE - 4]
+                while True:
+                    next_frame = src.read(frame_size)
+                    nonce = frame[:NONCE_SIZE]
+                    aad = _MORE_FRAMES_AAD if next_frame else None
+                    try:
+                        if nonce[:-4] != nonce_prefix or int.from_bytes(nonce[-4:], 'big') != counter:
+                            raise InvalidTag("Encrypted file frames are out of order")
+                        plaintext = self.cipher.decrypt(nonce, frame[NONCE_SIZE:], aad)
+                    except InvalidTag:
+                        if counter or not self._fernet:
+                            raise
+                        # Whole-file Fernet token written before chunked encryption;
+                        # its first bytes never pass the frame-order check
+                        src.seek(0)
+                        dst.write(self.decrypt_data(src.read()))
+                        break
+                    dst.write(plaintext)
+                    if not next_frame:
+                        break
+                    frame = next_frame
+                    counter += 1
+        except Exception:
+            if os.path.exists(output_filepath):
+                os.remove(output_filepath)
+            raise
+        return output_filepath
@@ -1,10 +1,15 @@
 import socket
 import struct
+import time
 from typing import Optional, Tuple
 
+LOCAL_IP_TTL = 60  # seconds a discovered local address is reused
+
 class NATTraversal:
     def __init__(self):
         self.upnp_enabled = False
+        self._cached_ip = None
+        self._cached_at = 0.0
         
     def setup_port_forwarding(self, port: int) -> bool:
         """Attempt to set up UPnP port forwarding"""
@@ -31,9 +36,15 @@ class NATTraversal:
         return False
     
     def _get_local_ip(self) -> str:
-        """Get local IP address"""
+        """Get local IP address, reusing the last lookup for LOCAL_IP_TTL seconds"""
+        if self._cached_ip and time.monotonic() - self._cached_at < LOCAL_IP_TTL:
+            return self._cached_ip
+
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(("8.8.8.8", 80))
         local_ip = s.getsockname()[0]
         s.close()
+
+        self._cached_ip = local_ip
+        self._cached_at = time.monotonic()
         return local_ip
@@ -1,139 +1,307 @@
-import socket
+import asyncio
+import struct
 import threading
 import json
 import time
 from typing import Dict, List, Callable, Optional
 from .nat_traversal import NATTraversal
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    orjson = None
+
+if orjson:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+    _loads = json.loads
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, frames fall back to JSON bodies
+    msgpack = None
+
+# Wire frame: 1-byte format version, 4-byte big-endian body length, body
+FRAME_HEADER = struct.Struct('>BI')
+FRAME_MSGPACK = 1
+FRAME_JSON = 2
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024  # drop peers that announce larger frames
+LISTEN_BACKLOG = 1024  # asyncio also accepts up to this many connections per wakeup
+
+def _encode_frame(message: Dict) -> bytes:
+    """Serialize a message into a length-prefixed frame"""
+    if msgpack:
+        body = msgpack.packb(message, use_bin_type=True)
+        version = FRAME_MSGPACK
+    else:
+        body = _dumps(message)
+        version = FRAME_JSON
+    return FRAME_HEADER.pack(version, len(body)) + body
+
+def _decode_body(version: int, body: bytes):
+    if version == FRAME_MSGPACK and msgpack:
+        return msgpack.unpackb(body, raw=False)
+    if version == FRAME_JSON:
+        return _loads(body)
+    raise ValueError(f"Unsupported frame version {version}")
+
 class P2PNode:
+    """Peer-to-peer node multiplexing all peer sockets on one asyncio event loop.
+
+    The loop runs in a background thread so the public methods stay
+    synchronous for callers that are not themselves async.
+    """
+
     def __init__(self, port: int = 9999):
         self.port = port
-        self.socket = None
-        self.peer_connections = {}  # peer_id -> socket
+        self.socket = None  # listening socket once the node is started
+        self.peer_connections = {}  # peer_id -> (reader, writer)
         self.message_handlers = {}
         self.is_running = False
         self.nat_traversal = NATTraversal()
-    
+        self._loop = None
+        self._loop_thread = None
+        self._server = None
+        self._dispatch_queue = None
+        self._dispatch_task = None
+        self._peer_tasks = set()
+
     def start_node(self):
         """Start the P2P node"""
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.socket.bind(('', self.port))
-        self.socket.listen(5)
+        self._ensure_loop()
+        self._run(self._serve())
         self.is_running = True
-        
+
         # Try to set up port forwarding for NAT traversal
         self.nat_traversal.setup_port_forwarding(self.port)
-        
-        # Start listening thread
-        listen_thread = threading.Thread(target=self._listen_for_connections)
-        listen_thread.daemon = True
-        listen_thread.start()
-        
+
         print(f"P2P node started on port {self.port}")
-    
+
     def stop_node(self):
         """Stop the P2P node"""
         self.is_running = False
-        if self.socket:
-            self.socket.close()
-        for peer_socket in self.peer_connections.values():
-            peer_socket.close()
+        if self._in_loop_thread():
+            # Called from a message handler: the loop thread cannot wait on
+            # itself, so finish the shutdown from a helper thread
+            threading.Thread(target=self.stop_node, daemon=True).start()
+            return
+        if self._loop:
+            self._run(self._shutdown())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+            self._loop_thread = None
         self.peer_connections.clear()
-    
+
     def connect_to_peer(self, peer_address: str, peer_port: int, peer_id: str):
-        """Connect to another peer"""
+        """Connect to another peer
+
+        From a message handler the connection is only scheduled: True means the
+        attempt was started, and the peer appears in peer_connections once it
+        succeeds.
+        """
+        if self._in_loop_thread():
+            task = asyncio.ensure_future(self._connect(peer_address, peer_port, peer_id))
+            task.add_done_callback(lambda t: self._report_connect(t, peer_id))
+            return True
         try:
-            peer_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            peer_socket.connect((peer_address, peer_port))
-            self.peer_connections[peer_id] = peer_socket
-            
-            # Start handling messages from this peer
-            handler_thread = threading.Thread(
-                target=self._handle_peer_messages, 
-                args=(peer_socket, peer_id)
-            )
-            handler_thread.daemon = True
-            handler_thread.start()
-            
+            self._ensure_loop()
+            self._run(self._connect(peer_address, peer_port, peer_id))
             return True
         except Exception as e:
             print(f"Failed to connect to peer {peer_id}: {e}")
             return False
-    
+
+    def _report_connect(self, task: asyncio.Task, peer_id: str):
+        if not task.cancelled() and task.exception():
+            print(f"Failed to connect to peer {peer_id}: {task.exception()}")
+
     def send_message(self, peer_id: str, message_type: str, data: Dict):
         """Send a message to a specific peer"""
         if peer_id not in self.peer_connections:
             return False
-        
+
         message = {
             'type': message_type,
             'timestamp': time.time(),
             'data': data
         }
-        
+
         try:
-            message_json = json.dumps(message) + '\n'
-            self.peer_connections[peer_id].send(message_json.encode())
+            _, writer = self.peer_connections[peer_id]
+            payload = _encode_frame(message)
+            if self._in_loop_thread():
+                # Called from a message handler: just queue the bytes on the transport
+                writer.write(payload)
+            else:
+                self._run(self._send(writer, payload))
             return True
         except Exception as e:
             print(f"Failed to send message to {peer_id}: {e}")
             return False
-    
+
     def broadcast_message(self, message_type: str, data: Dict):
         """Broadcast a message to all connected peers"""
-        for peer_id in list(self.peer_connections.keys()):
-            self.send_message(peer_id, message_type, data)
-    
+        if not self.peer_connections:
+            return
+
+        # Serialize once and share the payload between every peer
+        message = {
+            'type': message_type,
+            'timestamp': time.time(),
+            'data': data
+        }
+        payload = _encode_frame(message)
+
+        if self._in_loop_thread():
+            self._broadcast_nowait(payload)
+        elif self._loop:
+            self._run(self._broadcast(payload))
+
     def add_message_handler(self, message_type: str, handler: Callable):
         """Add a handler for specific message types"""
         self.message_handlers[message_type] = handler
-    
-    def _listen_for_connections(self):
-        """Listen for incoming peer connections"""
-        while self.is_running:
+
+    def _ensure_loop(self):
+        """Start the background event loop thread if it is not running yet"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever)
+            self._loop_thread.daemon = True
+            self._loop_thread.start()
+            self._run(self._start_dispatcher())
+
+    def _run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the node's event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def _in_loop_thread(self) -> bool:
+        return threading.current_thread() is self._loop_thread
+
+    async def _start_dispatcher(self):
+        self._dispatch_queue = asyncio.Queue()
+        self._dispatch_task = asyncio.ensure_future(self._dispatch_messages())
+
+    async def _serve(self):
+        self._server = await asyncio.start_server(
+            self._listen_for_connections, host='0.0.0.0', port=self.port,
+            reuse_address=True, backlog=LISTEN_BACKLOG
+        )
+        self.socket = self._server.sockets[0]
+
+    async def _shutdown(self):
+        if self._server:
+            self._server.close()
+        for _, writer in list(self.peer_connections.values()):
+            writer.close()
+        for task in list(self._peer_tasks):
+            task.cancel()
+        if self._dispatch_task:
+            self._dispatch_task.cancel()
+        await asyncio.gather(*self._peer_tasks, return_exceptions=True)
+        if self._server:
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _connect(self, peer_address: str, peer_port: int, peer_id: str):
+        reader, writer = await asyncio.open_connection(peer_address, peer_port)
+        self._register_peer(reader, writer, peer_id)
+
+    async def _send(self, writer: asyncio.StreamWriter, payload: bytes):
+        writer.write(payload)
+        await writer.drain()
+
+    def _broadcast_nowait(self, payload: bytes) -> List[asyncio.StreamWriter]:
+        """Queue payload on every peer transport, dropping peers that fail
+
+        Returns only the writers that still have buffered data to drain. The
+        transport sends straight from the event loop with one send() per peer,
+        so peers with empty buffers need no further work.
+        """
+        backlogged = []
+        for peer_id, (_, writer) in list(self.peer_connections.items()):
+            transport = writer.transport
+            if transport.is_closing():
+                self._drop_peer(peer_id, writer)
+                continue
             try:
-                client_socket, address = self.socket.accept()
-                peer_id = f"{address[0]}:{address[1]}"
-                self.peer_connections[peer_id] = client_socket
-                
-                handler_thread = threading.Thread(
-                    target=self._handle_peer_messages, 
-                    args=(client_socket, peer_id)
-                )
-                handler_thread.daemon = True
-                handler_thread.start()
-                
+                transport.write(payload)
             except Exception as e:
-                if self.is_running:
-                    print(f"Error accepting connection: {e}")
-    
-    def _handle_peer_messages(self, peer_socket: socket.socket, peer_id: str):
+                print(f"Failed to send message to {peer_id}: {e}")
+                self._drop_peer(peer_id, writer)
+                continue
+            if transport.get_write_buffer_size():
+                backlogged.append(writer)
+        return backlogged
+
+    async def _broadcast(self, payload: bytes):
+        writers = self._broadcast_nowait(payload)
+        if writers:
+            await asyncio.gather(*(writer.drain() for writer in writers),
+                                 return_exceptions=True)
+
+    def _drop_peer(self, peer_id: str, writer: asyncio.StreamWriter):
+        writer.close()
+        if self.peer_connections.get(peer_id, (None, None))[1] is writer:
+            del self.peer_connections[peer_id]
+
+    async def _listen_for_connections(self, reader: asyncio.StreamReader,
+                                      writer: asyncio.StreamWriter):
+        """Accept an incoming peer connection"""
+        address = writer.get_extra_info('peername')
+        peer_id = f"{address[0]}:{address[1]}"
+        self._register_peer(reader, writer, peer_id)
+
+    def _register_peer(self, reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter, peer_id: str):
+        self.peer_connections[peer_id] = (reader, writer)
+        task = asyncio.ensure_future(self._handle_peer_messages(reader, writer, peer_id))
+        self._peer_tasks.add(task)
+        task.add_done_callback(self._peer_tasks.discard)
+
+    async def _handle_peer_messages(self, reader: asyncio.StreamReader,
+                                    writer: asyncio.StreamWriter, peer_id: str):
         """Handle messages from a specific peer"""
-        buffer = ""
-        while self.is_running:
-            try:
-                data = peer_socket.recv(1024).decode()
-                if not data:
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                version, length = FRAME_HEADER.unpack(header)
+                if length > MAX_MESSAGE_SIZE:
+                    print(f"Message from {peer_id} exceeds {MAX_MESSAGE_SIZE} bytes, disconnecting")
                     break
-                
-                buffer += data
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-                    if line:
-                        try:
-                            message = json.loads(line)
-                            message_type = message.get('type')
-                            if message_type in self.message_handlers:
-                                self.message_handlers[message_type](peer_id, message['data'])
-                        except json.JSONDecodeError:
-                            print(f"Invalid JSON from {peer_id}: {line}")
-                            
-            except Exception as e:
-                print(f"Error handling messages from {peer_id}: {e}")
-                break
-        
+
+                body = await reader.readexactly(length)
+                try:
+                    message = _decode_body(version, body)
+                except (ValueError, TypeError) as e:
+                    print(f"Invalid message from {peer_id}: {e}")
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                # Resolve the handler here so unhandled types never reach the queue
+                try:
+                    handler = self.message_handlers.get(message.get('type'))
+                except TypeError:  # unhashable type field
+                    continue
+                if handler:
+                    self._dispatch_queue.put_nowait((peer_id, message, handler))
+        except (asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            print(f"Error handling messages from {peer_id}: {e}")
+
         # Clean up connection
-        peer_socket.close()
-        if peer_id in self.peer_connections:
-            del self.peer_connections[peer_id]
+        self._drop_peer(peer_id, writer)
+
+    async def _dispatch_messages(self):
+        """Deliver received messages to their registered handlers in arrival order"""
+        while True:
+            peer_id, message, handler = await self._dispatch_queue.get()
+            try:
+                handler(peer_id, message['data'])
+            except Exception as e:
+                print(f"Error in handler for {message['type']} from {peer_id}: {e}")
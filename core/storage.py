@@ -9,6 +9,7 @@ class SandboxedStorage:
     def __init__(self, base_path: str, encryption_engine: EncryptionEngine):
         self.base_path = Path(base_path)
         self.encryption = encryption_engine
+        self._sandbox_strs = {}  # category -> str path, see get_sandbox_str
         self._ensure_sandbox_structure()
     
     def _ensure_sandbox_structure(self):
@@ -40,3 +41,10 @@ class SandboxedStorage:
     
     def get_sandbox_path(self, category: str = "") -> Path:
         return self.base_path / category if category else self.base_path
+    
+    def get_sandbox_str(self, category: str = "") -> str:
+        """get_sandbox_path as a memoized str for APIs that take plain paths"""
+        path = self._sandbox_strs.get(category)
+        if path is None:
+            path = self._sandbox_strs[category] = str(self.get_sandbox_path(category))
+        return path
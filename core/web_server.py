@@ -1,10 +1,13 @@
 import http.server
-import socketserver
 import threading
+import io
 import os
 from typing import Callable, Optional
 import json
 
+# Static assets that may have a precompressed "<file>.gz" sidecar next to them
+GZIP_SIDECAR_EXTENSIONS = ('.js', '.css')
+
 class LocalWebServer:
     def __init__(self, port: int = 8080, document_root: str = "./www"):
         self.port = port
@@ -12,6 +15,9 @@ class LocalWebServer:
         self.server = None
         self.server_thread = None
         self.request_handlers = {}
+        # Requests get a thread each, but route handlers share one database
+        # connection (and handler state), so they still run one at a time
+        self._route_lock = threading.Lock()
     
     def add_route_handler(self, path: str, handler: Callable):
         """Add custom route handlers for dynamic content"""
@@ -20,7 +26,9 @@ class LocalWebServer:
     def start_server(self):
         """Start the web server in a separate thread"""
         handler = self._create_request_handler()
-        self.server = socketserver.TCPServer(("", self.port), handler)
+        # One thread per request so a slow download doesn't block other clients;
+        # static files are served concurrently, route handlers are serialized
+        self.server = http.server.ThreadingHTTPServer(("", self.port), handler)
         self.server_thread = threading.Thread(target=self.server.serve_forever)
         self.server_thread.daemon = True
         self.server_thread.start()
@@ -37,6 +45,7 @@ class LocalWebServer:
     def _create_request_handler(self):
         document_root = self.document_root
         route_handlers = self.request_handlers
+        route_lock = self._route_lock
         
         class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             def __init__(self, *args, **kwargs):
@@ -44,7 +53,8 @@ class LocalWebServer:
             
             def do_GET(self):
                 if self.path in route_handlers:
-                    response = route_handlers[self.path](self)
+                    with route_lock:
+                        response = route_handlers[self.path](self)
                     self._send_json_response(response)
                 else:
                     super().do_GET()
@@ -53,11 +63,45 @@ class LocalWebServer:
                 if self.path in route_handlers:
                     content_length = int(self.headers['Content-Length'])
                     post_data = self.rfile.read(content_length)
-                    response = route_handlers[self.path](self, post_data)
+                    with route_lock:
+                        response = route_handlers[self.path](self, post_data)
                     self._send_json_response(response)
                 else:
                     self._send_error_response(404)
             
+            def send_head(self):
+                path = self.translate_path(self.path)
+                if (path.endswith(GZIP_SIDECAR_EXTENSIONS)
+                        and 'gzip' in self.headers.get('Accept-Encoding', '')
+                        and os.path.isfile(path + '.gz')):
+                    return self._send_gzip_sidecar_head(path)
+                return super().send_head()
+
+            def _send_gzip_sidecar_head(self, path):
+                f = open(path + '.gz', 'rb')
+                try:
+                    fs = os.fstat(f.fileno())
+                    self.send_response(200)
+                    self.send_header('Content-type', self.guess_type(path))
+                    self.send_header('Content-Encoding', 'gzip')
+                    self.send_header('Content-Length', str(fs.st_size))
+                    self.send_header('Last-Modified', self.date_time_string(fs.st_mtime))
+                    self.send_header('Vary', 'Accept-Encoding')
+                    self.end_headers()
+                    return f
+                except:
+                    f.close()
+                    raise
+
+            def copyfile(self, source, outputfile):
+                # Regular files go through sendfile(2), skipping userspace buffers
+                try:
+                    source.fileno()
+                except (AttributeError, io.UnsupportedOperation):
+                    super().copyfile(source, outputfile)
+                    return
+                self.connection.sendfile(source)
+
             def _send_json_response(self, data):
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
@@ -1,22 +1,122 @@
 import sqlite3
 import json
+import threading
 import time
 import uuid
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Iterable
 from pathlib import Path
 from .models import User, Post, Connection, Comment, MediaFile
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    orjson = None
+
+# orjson.Fragment (3.9+) embeds already-serialized JSON without re-parsing it
+_Fragment = getattr(orjson, 'Fragment', None)
+
+if orjson:
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    _loads = json.loads
+    _dumps = json.dumps
+
 class LocalDatabase:
+    # Applied once per connection: WAL makes each commit an append instead of a
+    # journal rewrite + fsync, and lets readers run alongside the writer.
+    PRAGMAS = (
+        # Must precede the first CREATE TABLE; a no-op on databases that already exist
+        'PRAGMA auto_vacuum=INCREMENTAL',
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA cache_size=-65536',
+        'PRAGMA wal_autocheckpoint=1000',
+    )
+    INCREMENTAL_VACUUM_PAGES = 1000
+    MAINTENANCE_BUSY_TIMEOUT = 30  # seconds maintenance_tick waits for request writes to finish
+
+    # Fixed statements live here so every call reuses sqlite3's cached prepared statement
+    GET_USER_SQL = 'SELECT * FROM users WHERE user_id = ?'
+    GET_POST_SQL = 'SELECT * FROM posts WHERE post_id = ?'
+    GET_USER_POSTS_SQL = '''
+        SELECT * FROM posts WHERE user_id = ? 
+        ORDER BY created_at DESC LIMIT ? OFFSET ?
+    '''
+    GET_PUBLIC_POSTS_SQL = '''
+        SELECT * FROM posts WHERE privacy_level = 'public' 
+        ORDER BY created_at DESC LIMIT ? OFFSET ?
+    '''
+    GET_PUBLIC_POSTS_JSON_SQL = '''
+        SELECT post_id, user_id, content, media_urls, privacy_level,
+               created_at, updated_at, metadata
+        FROM posts WHERE privacy_level = 'public'
+        ORDER BY created_at DESC LIMIT ? OFFSET ?
+    '''
+    DELETE_POST_SQL = 'DELETE FROM posts WHERE post_id = ? AND user_id = ?'
+    GET_USER_CONNECTIONS_BY_STATUS_SQL = '''
+        SELECT * FROM connections WHERE user_id = ? AND connection_status = ?
+        ORDER BY created_at DESC
+    '''
+    GET_USER_CONNECTIONS_SQL = '''
+        SELECT * FROM connections WHERE user_id = ? 
+        ORDER BY created_at DESC
+    '''
+    UPDATE_CONNECTION_STATUS_SQL = '''
+        UPDATE connections SET connection_status = ?, updated_at = ? 
+        WHERE connection_id = ?
+    '''
+    GET_POST_COMMENTS_SQL = '''
+        SELECT * FROM comments WHERE post_id = ? 
+        ORDER BY created_at ASC
+    '''
+    GET_MEDIA_FILE_SQL = 'SELECT * FROM media_files WHERE file_id = ?'
+
+    INSERT_USER_SQL = '''
+        INSERT INTO users 
+        (user_id, name, bio, public_key, private_key_encrypted, created_at, updated_at, preferences)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    INSERT_POST_SQL = '''
+        INSERT INTO posts 
+        (post_id, user_id, content, media_urls, privacy_level, created_at, updated_at, metadata)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    INSERT_CONNECTION_SQL = '''
+        INSERT INTO connections 
+        (connection_id, user_id, peer_user_id, peer_public_key, connection_status, 
+         permissions, created_at, updated_at)
+        VALUES (?, ?, ?, ?, 'pending', ?, ?, ?)
+    '''
+    INSERT_COMMENT_SQL = '''
+        INSERT INTO comments (comment_id, post_id, author_id, content, created_at, is_encrypted)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+    INSERT_MEDIA_FILE_SQL = '''
+        INSERT INTO media_files 
+        (file_id, user_id, filename, file_path, file_type, file_size, 
+         is_encrypted, created_at, metadata)
+        VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)
+    '''
+
     def __init__(self, db_path: str):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self.connection = None
+        self._local = threading.local()  # per-thread cursor, see _cursor()
         self._initialize_database()
     
     def _initialize_database(self):
         """Initialize database connection and create tables"""
-        self.connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.connection = sqlite3.connect(str(self.db_path), check_same_thread=False,
+                                          cached_statements=256)
         self.connection.row_factory = sqlite3.Row  # Enable dict-like access
+        for pragma in self.PRAGMAS:
+            self.connection.execute(pragma)
         self._create_tables()
     
     def _create_tables(self):
@@ -102,13 +202,34 @@ class LocalDatabase:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_created_at ON posts (created_at DESC)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments (post_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_connections_user_id ON connections (user_id)')
+        # Public feed: partial index walked in created_at order, no filter or sort step
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_posts_public_recent ON posts (created_at DESC)
+            WHERE privacy_level = 'public'
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_conn_user_status
+            ON connections (user_id, connection_status, created_at DESC)
+        ''')
         
         self.connection.commit()
     
+    def _cursor(self) -> sqlite3.Cursor:
+        """Return this thread's reusable cursor"""
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._local.cursor = self.connection.cursor()
+        return cursor
+
     def close(self):
         """Close database connection"""
         if self.connection:
             self.connection.close()
+
+    def _insert_rows(self, sql: str, rows: List[Tuple]):
+        """Insert rows with one prepared statement inside a single transaction"""
+        with self.connection:
+            self.connection.executemany(sql, rows)
     
     # User operations
     def create_user(self, name: str, bio: str = "", public_key: str = "", 
@@ -116,24 +237,18 @@ class LocalDatabase:
         """Create a new user"""
         user_id = str(uuid.uuid4())
         current_time = time.time()
-        preferences_json = json.dumps(preferences or {})
+        preferences_json = _dumps(preferences or {})
         
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            INSERT INTO users 
-            (user_id, name, bio, public_key, private_key_encrypted, created_at, updated_at, preferences)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, name, bio, public_key, private_key_encrypted, 
-              current_time, current_time, preferences_json))
+        cursor = self._cursor()
+        cursor.execute(self.INSERT_USER_SQL, (user_id, name, bio, public_key, private_key_encrypted,
+                                              current_time, current_time, preferences_json))
         
         self.connection.commit()
         return user_id
     
     def get_user(self, user_id: str) -> Optional[User]:
         """Get user by ID"""
-        cursor = self.connection.cursor()
-        cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        row = cursor.fetchone()
+        row = self.connection.execute(self.GET_USER_SQL, (user_id,)).fetchone()
         
         if row:
             return User(
@@ -144,7 +259,8 @@ class LocalDatabase:
                 private_key_encrypted=row['private_key_encrypted'] or "",
                 created_at=row['created_at'],
                 updated_at=row['updated_at'],
-                preferences=json.loads(row['preferences'] or '{}')
+                # JSON columns are passed through raw; the model decodes on first access
+                preferences=row['preferences']
             )
         return None
     
@@ -155,14 +271,16 @@ class LocalDatabase:
         
         # Handle preferences separately as JSON
         if 'preferences' in kwargs:
-            kwargs['preferences'] = json.dumps(kwargs['preferences'])
+            kwargs['preferences'] = _dumps(kwargs['preferences'])
         
         kwargs['updated_at'] = time.time()
         
-        set_clause = ', '.join(f"{key} = ?" for key in kwargs.keys())
-        values = list(kwargs.values()) + [user_id]
+        # Sorted columns keep one SQL string per column set, so the statement cache hits
+        columns = sorted(kwargs)
+        set_clause = ', '.join(f"{key} = ?" for key in columns)
+        values = [kwargs[key] for key in columns] + [user_id]
         
-        cursor = self.connection.cursor()
+        cursor = self._cursor()
         cursor.execute(f'UPDATE users SET {set_clause} WHERE user_id = ?', values)
         self.connection.commit()
         
@@ -172,48 +290,44 @@ class LocalDatabase:
     def create_post(self, user_id: str, content: str, media_urls: List[str] = None,
                    privacy_level: str = 'public', metadata: Dict = None) -> str:
         """Create a new post"""
-        post_id = str(uuid.uuid4())
+        row = self._post_row(time.time(), user_id, content, media_urls, privacy_level, metadata)
+        self._insert_rows(self.INSERT_POST_SQL, [row])
+        return row[0]
+
+    def create_posts_bulk(self, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """Create many posts in one transaction; records take create_post's keyword arguments"""
         current_time = time.time()
-        media_urls_json = json.dumps(media_urls or [])
-        metadata_json = json.dumps(metadata or {})
-        
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            INSERT INTO posts 
-            (post_id, user_id, content, media_urls, privacy_level, created_at, updated_at, metadata)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (post_id, user_id, content, media_urls_json, privacy_level, 
-              current_time, current_time, metadata_json))
-        
-        self.connection.commit()
-        return post_id
+        rows = [self._post_row(current_time, **record) for record in records]
+        self._insert_rows(self.INSERT_POST_SQL, rows)
+        return [row[0] for row in rows]
+
+    def _post_row(self, current_time: float, user_id: str, content: str,
+                  media_urls: List[str] = None, privacy_level: str = 'public',
+                  metadata: Dict = None) -> Tuple:
+        return (str(uuid.uuid4()), user_id, content, _dumps(media_urls or []), privacy_level,
+                current_time, current_time, _dumps(metadata or {}))
     
     def get_post(self, post_id: str) -> Optional[Post]:
         """Get post by ID"""
-        cursor = self.connection.cursor()
-        cursor.execute('SELECT * FROM posts WHERE post_id = ?', (post_id,))
-        row = cursor.fetchone()
+        row = self.connection.execute(self.GET_POST_SQL, (post_id,)).fetchone()
         
         if row:
             return Post(
                 post_id=row['post_id'],
                 user_id=row['user_id'],
                 content=row['content'],
-                media_urls=json.loads(row['media_urls'] or '[]'),
+                media_urls=_loads(row['media_urls']) if row['media_urls'] else [],
                 privacy_level=row['privacy_level'],
                 created_at=row['created_at'],
                 updated_at=row['updated_at'],
-                metadata=json.loads(row['metadata'] or '{}')
+                metadata=row['metadata']
             )
         return None
     
     def get_user_posts(self, user_id: str, limit: int = 50, offset: int = 0) -> List[Post]:
         """Get posts by user ID"""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            SELECT * FROM posts WHERE user_id = ? 
-            ORDER BY created_at DESC LIMIT ? OFFSET ?
-        ''', (user_id, limit, offset))
+        cursor = self._cursor()
+        cursor.execute(self.GET_USER_POSTS_SQL, (user_id, limit, offset))
         
         posts = []
         for row in cursor.fetchall():
@@ -221,22 +335,19 @@ class LocalDatabase:
                 post_id=row['post_id'],
                 user_id=row['user_id'],
                 content=row['content'],
-                media_urls=json.loads(row['media_urls'] or '[]'),
+                media_urls=_loads(row['media_urls']) if row['media_urls'] else [],
                 privacy_level=row['privacy_level'],
                 created_at=row['created_at'],
                 updated_at=row['updated_at'],
-                metadata=json.loads(row['metadata'] or '{}')
+                metadata=row['metadata']
             ))
         
         return posts
     
     def get_public_posts(self, limit: int = 50, offset: int = 0) -> List[Post]:
         """Get all public posts"""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            SELECT * FROM posts WHERE privacy_level = 'public' 
-            ORDER BY created_at DESC LIMIT ? OFFSET ?
-        ''', (limit, offset))
+        cursor = self._cursor()
+        cursor.execute(self.GET_PUBLIC_POSTS_SQL, (limit, offset))
         
         posts = []
         for row in cursor.fetchall():
@@ -244,19 +355,46 @@ class LocalDatabase:
                 post_id=row['post_id'],
                 user_id=row['user_id'],
                 content=row['content'],
-                media_urls=json.loads(row['media_urls'] or '[]'),
+                media_urls=_loads(row['media_urls']) if row['media_urls'] else [],
                 privacy_level=row['privacy_level'],
                 created_at=row['created_at'],
                 updated_at=row['updated_at'],
-                metadata=json.loads(row['metadata'] or '{}')
+                metadata=row['metadata']
             ))
         
         return posts
     
+    def get_public_posts_json(self, limit: int = 50, offset: int = 0) -> bytes:
+        """Get public posts as a serialized JSON array without building Post objects
+
+        The media_urls/metadata columns are already JSON, so with orjson they are
+        embedded verbatim instead of being parsed and re-serialized.
+        """
+        cursor = self._cursor()
+        cursor.execute(self.GET_PUBLIC_POSTS_JSON_SQL, (limit, offset))
+
+        embed = _Fragment or _loads
+        posts = [
+            {
+                'post_id': row[0],
+                'user_id': row[1],
+                'content': row[2],
+                'media_urls': embed(row[3] or '[]'),
+                'privacy_level': row[4],
+                'created_at': row[5],
+                'updated_at': row[6],
+                'metadata': embed(row[7] or '{}')
+            }
+            for row in cursor.fetchall()
+        ]
+        if orjson:
+            return orjson.dumps(posts)
+        return json.dumps(posts).encode()
+
     def delete_post(self, post_id: str, user_id: str) -> bool:
         """Delete a post (only by owner)"""
-        cursor = self.connection.cursor()
-        cursor.execute('DELETE FROM posts WHERE post_id = ? AND user_id = ?', (post_id, user_id))
+        cursor = self._cursor()
+        cursor.execute(self.DELETE_POST_SQL, (post_id, user_id))
         self.connection.commit()
         return cursor.rowcount > 0
     
@@ -264,37 +402,31 @@ class LocalDatabase:
     def create_connection(self, user_id: str, peer_user_id: str, peer_public_key: str = "",
                          permissions: Dict = None) -> str:
         """Create a new connection"""
-        connection_id = str(uuid.uuid4())
+        row = self._connection_row(time.time(), user_id, peer_user_id, peer_public_key, permissions)
+        self._insert_rows(self.INSERT_CONNECTION_SQL, [row])
+        return row[0]
+
+    def create_connections_bulk(self, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """Create many connections in one transaction; records take create_connection's keyword arguments"""
         current_time = time.time()
+        rows = [self._connection_row(current_time, **record) for record in records]
+        self._insert_rows(self.INSERT_CONNECTION_SQL, rows)
+        return [row[0] for row in rows]
+
+    def _connection_row(self, current_time: float, user_id: str, peer_user_id: str,
+                        peer_public_key: str = "", permissions: Dict = None) -> Tuple:
         default_permissions = {'view': True, 'comment': True, 'share': False}
-        permissions_json = json.dumps(permissions or default_permissions)
-        
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            INSERT INTO connections 
-            (connection_id, user_id, peer_user_id, peer_public_key, connection_status, 
-             permissions, created_at, updated_at)
-            VALUES (?, ?, ?, ?, 'pending', ?, ?, ?)
-        ''', (connection_id, user_id, peer_user_id, peer_public_key, 
-              permissions_json, current_time, current_time))
-        
-        self.connection.commit()
-        return connection_id
+        return (str(uuid.uuid4()), user_id, peer_user_id, peer_public_key,
+                _dumps(permissions or default_permissions), current_time, current_time)
     
     def get_user_connections(self, user_id: str, status: str = None) -> List[Connection]:
         """Get connections for a user"""
-        cursor = self.connection.cursor()
+        cursor = self._cursor()
         
         if status:
-            cursor.execute('''
-                SELECT * FROM connections WHERE user_id = ? AND connection_status = ?
-                ORDER BY created_at DESC
-            ''', (user_id, status))
+            cursor.execute(self.GET_USER_CONNECTIONS_BY_STATUS_SQL, (user_id, status))
         else:
-            cursor.execute('''
-                SELECT * FROM connections WHERE user_id = ? 
-                ORDER BY created_at DESC
-            ''', (user_id,))
+            cursor.execute(self.GET_USER_CONNECTIONS_SQL, (user_id,))
         
         connections = []
         for row in cursor.fetchall():
@@ -304,7 +436,7 @@ class LocalDatabase:
                 peer_user_id=row['peer_user_id'],
                 peer_public_key=row['peer_public_key'] or "",
                 connection_status=row['connection_status'],
-                permissions=json.loads(row['permissions'] or '{}'),
+                permissions=row['permissions'],
                 created_at=row['created_at'],
                 updated_at=row['updated_at']
             ))
@@ -313,11 +445,8 @@ class LocalDatabase:
     
     def update_connection_status(self, connection_id: str, status: str) -> bool:
         """Update connection status"""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            UPDATE connections SET connection_status = ?, updated_at = ? 
-            WHERE connection_id = ?
-        ''', (status, time.time(), connection_id))
+        cursor = self._cursor()
+        cursor.execute(self.UPDATE_CONNECTION_STATUS_SQL, (status, time.time(), connection_id))
         self.connection.commit()
         return cursor.rowcount > 0
     
@@ -325,25 +454,25 @@ class LocalDatabase:
     def create_comment(self, post_id: str, author_id: str, content: str, 
                       is_encrypted: bool = False) -> str:
         """Create a new comment"""
-        comment_id = str(uuid.uuid4())
+        row = self._comment_row(time.time(), post_id, author_id, content, is_encrypted)
+        self._insert_rows(self.INSERT_COMMENT_SQL, [row])
+        return row[0]
+
+    def create_comments_bulk(self, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """Create many comments in one transaction; records take create_comment's keyword arguments"""
         current_time = time.time()
-        
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            INSERT INTO comments (comment_id, post_id, author_id, content, created_at, is_encrypted)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (comment_id, post_id, author_id, content, current_time, is_encrypted))
-        
-        self.connection.commit()
-        return comment_id
+        rows = [self._comment_row(current_time, **record) for record in records]
+        self._insert_rows(self.INSERT_COMMENT_SQL, rows)
+        return [row[0] for row in rows]
+
+    def _comment_row(self, current_time: float, post_id: str, author_id: str, content: str,
+                     is_encrypted: bool = False) -> Tuple:
+        return (str(uuid.uuid4()), post_id, author_id, content, current_time, is_encrypted)
     
     def get_post_comments(self, post_id: str) -> List[Comment]:
         """Get comments for a post"""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            SELECT * FROM comments WHERE post_id = ? 
-            ORDER BY created_at ASC
-        ''', (post_id,))
+        cursor = self._cursor()
+        cursor.execute(self.GET_POST_COMMENTS_SQL, (post_id,))
         
         comments = []
         for row in cursor.fetchall():
@@ -362,27 +491,26 @@ class LocalDatabase:
     def store_media_file(self, user_id: str, filename: str, file_path: str,
                         file_type: str, file_size: int, metadata: Dict = None) -> str:
         """Store media file information"""
-        file_id = str(uuid.uuid4())
+        row = self._media_file_row(time.time(), user_id, filename, file_path,
+                                   file_type, file_size, metadata)
+        self._insert_rows(self.INSERT_MEDIA_FILE_SQL, [row])
+        return row[0]
+
+    def store_media_files_bulk(self, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """Store many media file records in one transaction; records take store_media_file's keyword arguments"""
         current_time = time.time()
-        metadata_json = json.dumps(metadata or {})
-        
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            INSERT INTO media_files 
-            (file_id, user_id, filename, file_path, file_type, file_size, 
-             is_encrypted, created_at, metadata)
-            VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)
-        ''', (file_id, user_id, filename, file_path, file_type, file_size, 
-              current_time, metadata_json))
-        
-        self.connection.commit()
-        return file_id
-    
+        rows = [self._media_file_row(current_time, **record) for record in records]
+        self._insert_rows(self.INSERT_MEDIA_FILE_SQL, rows)
+        return [row[0] for row in rows]
+
+    def _media_file_row(self, current_time: float, user_id: str, filename: str, file_path: str,
+                        file_type: str, file_size: int, metadata: Dict = None) -> Tuple:
+        return (str(uuid.uuid4()), user_id, filename, file_path, file_type, file_size,
+                current_time, _dumps(metadata or {}))
+
     def get_media_file(self, file_id: str) -> Optional[MediaFile]:
         """Get media file by ID"""
-        cursor = self.connection.cursor()
-        cursor.execute('SELECT * FROM media_files WHERE file_id = ?', (file_id,))
-        row = cursor.fetchone()
+        row = self.connection.execute(self.GET_MEDIA_FILE_SQL, (file_id,)).fetchone()
         
         if row:
             return MediaFile(
@@ -394,14 +522,14 @@ class LocalDatabase:
                 file_size=row['file_size'],
                 is_encrypted=bool(row['is_encrypted']),
                 created_at=row['created_at'],
-                metadata=json.loads(row['metadata'] or '{}')
+                metadata=row['metadata']
             )
         return None
     
     # Utility methods
     def get_database_stats(self) -> Dict[str, int]:
         """Get database statistics"""
-        cursor = self.connection.cursor()
+        cursor = self._cursor()
         stats = {}
         
         tables = ['users', 'posts', 'connections', 'comments', 'media_files']
@@ -411,7 +539,27 @@ class LocalDatabase:
         
         return stats
     
+    def maintenance_tick(self):
+        """Reclaim free pages and refresh planner statistics
+
+        Cheap enough to run periodically from a background thread, unlike a
+        full VACUUM, which rewrites the whole file under an exclusive lock.
+        Runs on a short-lived connection of its own, so SQLite's write lock
+        orders it against request threads instead of it committing (or
+        landing inside) a transaction open on the shared connection.
+        """
+        connection = sqlite3.connect(str(self.db_path), timeout=self.MAINTENANCE_BUSY_TIMEOUT)
+        try:
+            # incremental_vacuum frees one page per sqlite3_step() but returns no
+            # rows, so execute() (and fetchall()) stop after a single page;
+            # executescript steps it to completion. Its leading COMMIT is harmless
+            # on this private connection.
+            connection.executescript(
+                f'PRAGMA incremental_vacuum({self.INCREMENTAL_VACUUM_PAGES}); ANALYZE;'
+            )
+        finally:
+            connection.close()
+
     def vacuum_database(self):
         """Optimize database storage"""
-        self.connection.execute('VACUUM')
-        self.connection.commit()
+        self.maintenance_tick()
@@ -3,25 +3,119 @@
 Database migration system for Decentralized Social Media Platform
 """
 
+import hashlib
+import inspect
+import logging
 import sqlite3
+import sys
 import time
 import json
-from typing import List, Dict, Callable
+from contextlib import closing, contextmanager, nullcontext
+from typing import List, Dict, Callable, Union
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# Placeholder checksums recorded by earlier releases; replaced with real ones on sight
+LEGACY_CHECKSUMS = frozenset({'abc123', 'def456', 'ghi789', 'jkl012'})
+
+def _checksum(up: Callable) -> str:
+    """SHA-256 of a migration's source with indentation and blank lines normalized"""
+    try:
+        source = inspect.getsource(up)
+        data = '\n'.join(line.strip() for line in source.splitlines() if line.strip()).encode()
+    except (OSError, TypeError):  # no source available (e.g. frozen build)
+        data = up.__code__.co_code
+    return hashlib.sha256(data).hexdigest()
+
+# id() of connections whose migrations run inside an outer transaction: an
+# all-or-nothing migrate_to_latest(atomic=True), or one the caller left open
+_batched_connections = set()
+
+class _MigrationFailed(Exception):
+    """Raised inside a migration batch so the whole batch rolls back"""
+
+def _execute_script(conn: sqlite3.Connection, statements: List[str]):
+    """Run DDL statements with a single executescript call
+
+    executescript commits whatever is pending before it starts, so the script
+    reopens the transaction itself; the surrounding DatabaseMigrator._transaction
+    then commits or rolls it back together with the schema_migrations update.
+    Inside an atomic batch or a caller's transaction that commit would end the
+    outer transaction early, so the statements are executed one by one instead.
+    """
+    if id(conn) in _batched_connections:
+        for statement in statements:
+            conn.execute(statement)
+        return
+    conn.executescript('BEGIN IMMEDIATE;\n' + ';\n'.join(statements) + ';')
+
 class DatabaseMigrator:
     """Handle database schema migrations"""
     
+    # Index builds over existing rows touch every page: keep them cached/mmapped
+    PRAGMAS = (
+        'PRAGMA cache_size=-65536',
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA temp_store=MEMORY',
+    )
+    # synchronous=NORMAL is only durable-safe under WAL, so it is applied only to
+    # connections found in WAL mode; others keep their own setting
+    WAL_PRAGMAS = (
+        'PRAGMA synchronous=NORMAL',
+    )
+    
+    # Fixed statements, so every migration reuses sqlite3's cached prepared statement
+    MIGRATIONS_TABLE_EXISTS_SQL = (
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    )
+    GET_CURRENT_VERSION_SQL = 'SELECT MAX(version) FROM schema_migrations'
+    GET_APPLIED_MIGRATIONS_SQL = '''
+        SELECT version, name, applied_at, checksum 
+        FROM schema_migrations 
+        ORDER BY version
+    '''
+    INSERT_MIGRATION_SQL = '''
+        INSERT INTO schema_migrations (version, name, applied_at, checksum)
+        VALUES (?, ?, ?, ?)
+    '''
+    DELETE_MIGRATION_SQL = 'DELETE FROM schema_migrations WHERE version = ?'
+    UPDATE_CHECKSUM_SQL = 'UPDATE schema_migrations SET checksum = ? WHERE version = ?'
+    
+    # Columns added to users by migration 003
+    USER_SETTINGS_COLUMNS = (
+        ('theme', "TEXT DEFAULT 'light'"),
+        ('language', "TEXT DEFAULT 'en'"),
+        ('timezone', "TEXT DEFAULT 'UTC'"),
+        ('notification_settings', "TEXT DEFAULT '{}'"),
+    )
+    
     def __init__(self, db_connection: sqlite3.Connection):
         self.connection = db_connection
+        for pragma in self.PRAGMAS:
+            self.connection.execute(pragma)
+        # SQLite refuses to change synchronous inside a caller's open transaction
+        if (not self.connection.in_transaction
+                and self.connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'):
+            for pragma in self.WAL_PRAGMAS:
+                self.connection.execute(pragma)
         self.migrations = []
         self._init_migrations_table()
         self._register_migrations()
+        self.migrations.sort(key=lambda m: m['version'])
+        self._by_version = {m['version']: m for m in self.migrations}
+        self._latest_version = max(self._by_version, default=0)
+        self._current_version = None  # loaded lazily, kept in sync by apply/rollback
+        self._batch = False  # True while migrate_to_latest(atomic=True) holds the transaction
     
     def _init_migrations_table(self):
         """Create migrations tracking table"""
-        cursor = self.connection.cursor()
-        cursor.execute('''
+        # A plain lookup avoids parsing DDL and committing on every construction
+        if self.connection.execute(self.MIGRATIONS_TABLE_EXISTS_SQL).fetchone():
+            return
+        # A transaction the caller has open is theirs to commit
+        in_caller_transaction = self.connection.in_transaction
+        self.connection.execute('''
             CREATE TABLE IF NOT EXISTS schema_migrations (
                 version INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
@@ -29,7 +123,8 @@ class DatabaseMigrator:
                 checksum TEXT
             )
         ''')
-        self.connection.commit()
+        if not in_caller_transaction:
+            self.connection.commit()
     
     def _register_migrations(self):
         """Register all available migrations"""
@@ -40,7 +135,7 @@ class DatabaseMigrator:
             'description': 'Create initial database schema',
             'up': self._migration_001_up,
             'down': self._migration_001_down,
-            'checksum': 'abc123'
+            'checksum': _checksum(self._migration_001_up)
         })
         
         # Migration 002: Add indexes for performance
@@ -50,7 +145,7 @@ class DatabaseMigrator:
             'description': 'Add database indexes for better performance',
             'up': self._migration_002_up,
             'down': self._migration_002_down,
-            'checksum': 'def456'
+            'checksum': _checksum(self._migration_002_up)
         })
         
         # Migration 003: Add user preferences and settings
@@ -60,7 +155,7 @@ class DatabaseMigrator:
             'description': 'Add enhanced user settings and preferences',
             'up': self._migration_003_up,
             'down': self._migration_003_down,
-            'checksum': 'ghi789'
+            'checksum': _checksum(self._migration_003_up)
         })
         
         # Migration 004: Add post reactions and engagement
@@ -70,63 +165,104 @@ class DatabaseMigrator:
             'description': 'Add post reactions and engagement tracking',
             'up': self._migration_004_up,
             'down': self._migration_004_down,
-            'checksum': 'jkl012'
+            'checksum': _checksum(self._migration_004_up)
         })
+        
+        # Migration 005: Denormalized per-post like counts
+        self.migrations.append({
+            'version': 5,
+            'name': 'add_post_like_counts',
+            'description': 'Keep a trigger-maintained like_count on posts',
+            'up': self._migration_005_up,
+            'down': self._migration_005_down,
+            'checksum': _checksum(self._migration_005_up)
+        })
+    
+    def add_migration(self, migration: Dict):
+        """Register an additional migration after the built-in ones"""
+        self.migrations.append(migration)
+        self.migrations.sort(key=lambda m: m['version'])
+        self._by_version[migration['version']] = migration
+        self._latest_version = max(self._latest_version, migration['version'])
     
     def get_current_version(self) -> int:
         """Get current database schema version"""
-        cursor = self.connection.cursor()
-        cursor.execute('SELECT MAX(version) FROM schema_migrations')
-        result = cursor.fetchone()
-        return result[0] if result[0] is not None else 0
+        if self._current_version is None:
+            result = self.connection.execute(self.GET_CURRENT_VERSION_SQL).fetchone()
+            self._current_version = result[0] if result[0] is not None else 0
+        return self._current_version
     
     def get_applied_migrations(self) -> List[Dict]:
         """Get list of applied migrations"""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            SELECT version, name, applied_at, checksum 
-            FROM schema_migrations 
-            ORDER BY version
-        ''')
-        
-        migrations = []
-        for row in cursor.fetchall():
-            migrations.append({
-                'version': row[0],
-                'name': row[1],
-                'applied_at': row[2],
-                'checksum': row[3]
-            })
-        
-        return migrations
+        rows = self.connection.execute(self.GET_APPLIED_MIGRATIONS_SQL)
+        # Per-cursor factory, so a shared connection's own row_factory is untouched
+        rows.row_factory = sqlite3.Row
+        return [dict(row) for row in rows]
     
-    def migrate_to_latest(self) -> bool:
-        """Apply all pending migrations"""
+    def verify_checksums(self) -> bool:
+        """Check applied migrations against the code that would apply them now
+
+        Returns False if an applied migration has since been modified. Legacy
+        placeholder checksums are replaced with the current ones.
+        """
+        for applied in self.get_applied_migrations():
+            migration = self._by_version.get(applied['version'])
+            if migration is None:
+                continue
+            if not applied['checksum'] or applied['checksum'] in LEGACY_CHECKSUMS:
+                in_caller_transaction = self.connection.in_transaction
+                self.connection.execute(self.UPDATE_CHECKSUM_SQL,
+                                        (migration['checksum'], applied['version']))
+                if not in_caller_transaction:
+                    self.connection.commit()
+            elif applied['checksum'] != migration['checksum']:
+                logger.error("Migration %d (%s) was modified after it was applied",
+                             applied['version'], applied['name'])
+                return False
+        return True
+    
+    def migrate_to_latest(self, atomic: bool = False) -> bool:
+        """Apply all pending migrations
+
+        With atomic=True every pending migration runs in one transaction, so a
+        failure leaves the database at its starting version.
+        """
+        if not self.verify_checksums():
+            return False
         current_version = self.get_current_version()
-        target_version = max(m['version'] for m in self.migrations)
+        target_version = self._latest_version
         
         if current_version >= target_version:
-            print(f"Database already at latest version ({current_version})")
+            logger.info("Database already at latest version (%d)", current_version)
             return True
         
-        print(f"Migrating database from version {current_version} to {target_version}")
+        logger.info("Migrating database from version %d to %d", current_version, target_version)
         
         # Apply pending migrations
-        for migration in self.migrations:
-            if migration['version'] > current_version:
-                if not self._apply_migration(migration):
-                    print(f"Migration {migration['version']} failed!")
-                    return False
+        try:
+            with self._batched() if atomic else nullcontext():
+                for migration in self.migrations:
+                    if migration['version'] > current_version:
+                        if not self._apply_migration(migration):
+                            logger.error("Migration %d failed!", migration['version'])
+                            raise _MigrationFailed()
+        except _MigrationFailed:
+            if atomic:
+                self._current_version = None  # the batch rolled back to the start
+            return False
         
-        print("Database migration completed successfully")
+        self._analyze()
+        logger.info("Database migration completed successfully")
         return True
     
     def migrate_to_version(self, target_version: int) -> bool:
         """Migrate to specific version"""
+        if not self.verify_checksums():
+            return False
         current_version = self.get_current_version()
         
         if current_version == target_version:
-            print(f"Database already at version {target_version}")
+            logger.info("Database already at version %d", target_version)
             return True
         
         if target_version > current_version:
@@ -135,70 +271,126 @@ class DatabaseMigrator:
                 if current_version < migration['version'] <= target_version:
                     if not self._apply_migration(migration):
                         return False
+            self._analyze()
         else:
             # Migrate down
             applied_migrations = self.get_applied_migrations()
             for migration_info in reversed(applied_migrations):
                 if migration_info['version'] > target_version:
-                    migration = next(
-                        (m for m in self.migrations if m['version'] == migration_info['version']), 
-                        None
-                    )
+                    migration = self._by_version.get(migration_info['version'])
                     if migration and not self._rollback_migration(migration):
                         return False
         
         return True
     
+    def _analyze(self):
+        """Refresh planner statistics so freshly created indexes are used right away"""
+        try:
+            in_caller_transaction = self.connection.in_transaction
+            # Sample at most ~1000 rows per index to keep this cheap on large tables
+            self.connection.execute('PRAGMA analysis_limit=1000')
+            self.connection.execute('ANALYZE')
+            if not in_caller_transaction:
+                self.connection.commit()
+        except sqlite3.Error as e:
+            logger.warning("ANALYZE after migration failed: %s", e)
+    
+    @contextmanager
+    def _batched(self):
+        """Hold one transaction open across several _apply_migration calls"""
+        with self._transaction():
+            self._batch = True
+            _batched_connections.add(id(self.connection))
+            try:
+                yield
+            finally:
+                self._batch = False
+                _batched_connections.discard(id(self.connection))
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the block in one explicit BEGIN IMMEDIATE ... COMMIT
+
+        The driver's implicit transactions are switched off for the duration so
+        DDL does not commit early, then restored because the connection may be
+        shared with LocalDatabase. Inside a batch, or a transaction the caller
+        already has open, each block becomes a savepoint of that transaction
+        instead, and committing it is left to its owner.
+        """
+        if self._batch or self.connection.in_transaction:
+            in_caller_transaction = not self._batch
+            if in_caller_transaction:
+                _batched_connections.add(id(self.connection))
+            try:
+                self.connection.execute('SAVEPOINT migration_step')
+                try:
+                    yield
+                except BaseException:
+                    self.connection.execute('ROLLBACK TO migration_step')
+                    self.connection.execute('RELEASE migration_step')
+                    raise
+                self.connection.execute('RELEASE migration_step')
+            finally:
+                if in_caller_transaction:
+                    _batched_connections.discard(id(self.connection))
+            return
+        
+        isolation_level = self.connection.isolation_level
+        self.connection.isolation_level = None
+        try:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+            self.connection.execute('COMMIT')
+        finally:
+            self.connection.isolation_level = isolation_level
+
     def _apply_migration(self, migration: Dict) -> bool:
         """Apply a single migration"""
-        print(f"Applying migration {migration['version']}: {migration['name']}")
+        logger.info("Applying migration %d: %s", migration['version'], migration['name'])
         
         try:
-            # Execute the migration
-            migration['up'](self.connection)
+            with self._transaction():
+                # Execute the migration
+                migration['up'](self.connection)
+                
+                # Record the migration
+                self.connection.execute(self.INSERT_MIGRATION_SQL, (
+                    migration['version'],
+                    migration['name'],
+                    time.time(),
+                    migration['checksum']
+                ))
             
-            # Record the migration
-            cursor = self.connection.cursor()
-            cursor.execute('''
-                INSERT INTO schema_migrations (version, name, applied_at, checksum)
-                VALUES (?, ?, ?, ?)
-            ''', (
-                migration['version'],
-                migration['name'],
-                time.time(),
-                migration['checksum']
-            ))
-            
-            self.connection.commit()
-            print(f"✓ Migration {migration['version']} applied successfully")
+            self._current_version = migration['version']
+            logger.info("✓ Migration %d applied successfully", migration['version'])
             return True
             
         except Exception as e:
-            print(f"✗ Migration {migration['version']} failed: {e}")
-            self.connection.rollback()
+            logger.error("✗ Migration %d failed: %s", migration['version'], e)
             return False
     
     def _rollback_migration(self, migration: Dict) -> bool:
         """Rollback a single migration"""
-        print(f"Rolling back migration {migration['version']}: {migration['name']}")
+        logger.info("Rolling back migration %d: %s", migration['version'], migration['name'])
         
         try:
-            # Execute the rollback
-            migration['down'](self.connection)
+            with self._transaction():
+                # Execute the rollback
+                migration['down'](self.connection)
+                
+                # Remove migration record
+                self.connection.execute(self.DELETE_MIGRATION_SQL, (migration['version'],))
             
-            # Remove migration record
-            cursor = self.connection.cursor()
-            cursor.execute('''
-                DELETE FROM schema_migrations WHERE version = ?
-            ''', (migration['version'],))
-            
-            self.connection.commit()
-            print(f"✓ Migration {migration['version']} rolled back successfully")
+            self._current_version = None  # previous version need not be version - 1
+            logger.info("✓ Migration %d rolled back successfully", migration['version'])
             return True
             
         except Exception as e:
-            print(f"✗ Migration {migration['version']} rollback failed: {e}")
-            self.connection.rollback()
+            logger.error("✗ Migration %d rollback failed: %s", migration['version'], e)
             return False
     
     # Migration implementations
@@ -206,15 +398,12 @@ class DatabaseMigrator:
         """Initial schema - handled by LocalDatabase.__init__"""
         # This migration is automatically applied by LocalDatabase
         # Just ensure the tables exist
-        cursor = conn.cursor()
-        
-        # Verify core tables exist
-        cursor.execute("""
+        rows = conn.execute("""
             SELECT name FROM sqlite_master 
             WHERE type='table' AND name IN ('users', 'posts', 'connections', 'comments', 'media_files')
         """)
         
-        existing_tables = {row[0] for row in cursor.fetchall()}
+        existing_tables = {row[0] for row in rows}
         expected_tables = {'users', 'posts', 'connections', 'comments', 'media_files'}
         
         if not expected_tables.issubset(existing_tables):
@@ -222,16 +411,13 @@ class DatabaseMigrator:
     
     def _migration_001_down(self, conn: sqlite3.Connection):
         """Drop all tables"""
-        cursor = conn.cursor()
         tables = ['media_files', 'comments', 'connections', 'posts', 'users']
         
         for table in tables:
-            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            conn.execute(f'DROP TABLE IF EXISTS {table}')
     
     def _migration_002_up(self, conn: sqlite3.Connection):
         """Add performance indexes"""
-        cursor = conn.cursor()
-        
         # Additional indexes for better query performance
         indexes = [
             'CREATE INDEX IF NOT EXISTS idx_posts_privacy_created ON posts (privacy_level, created_at DESC)',
@@ -241,13 +427,10 @@ class DatabaseMigrator:
             'CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at DESC)'
         ]
         
-        for index_sql in indexes:
-            cursor.execute(index_sql)
+        _execute_script(conn, indexes)
     
     def _migration_002_down(self, conn: sqlite3.Connection):
         """Drop performance indexes"""
-        cursor = conn.cursor()
-        
         indexes = [
             'DROP INDEX IF EXISTS idx_posts_privacy_created',
             'DROP INDEX IF EXISTS idx_comments_created_at', 
@@ -256,33 +439,18 @@ class DatabaseMigrator:
             'DROP INDEX IF EXISTS idx_users_created_at'
         ]
         
-        for index_sql in indexes:
-            cursor.execute(index_sql)
+        _execute_script(conn, indexes)
     
     def _migration_003_up(self, conn: sqlite3.Connection):
         """Add enhanced user settings"""
-        cursor = conn.cursor()
-        
-        # Add new columns to users table
-        try:
-            cursor.execute('ALTER TABLE users ADD COLUMN theme TEXT DEFAULT "light"')
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute('ALTER TABLE users ADD COLUMN language TEXT DEFAULT "en"')
-        except sqlite3.OperationalError:
-            pass
-        
-        try:
-            cursor.execute('ALTER TABLE users ADD COLUMN timezone TEXT DEFAULT "UTC"')
-        except sqlite3.OperationalError:
-            pass
-        
-        try:
-            cursor.execute('ALTER TABLE users ADD COLUMN notification_settings TEXT DEFAULT "{}"')
-        except sqlite3.OperationalError:
-            pass
+        # ADD COLUMN with a constant DEFAULT only rewrites the schema record, never
+        # the rows, so it beats a users table rebuild + copy. Defaults must be
+        # single-quoted literals: double quotes are identifiers and are rejected
+        # by SQLite builds compiled without the DQS misfeature.
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(users)')}
+        for column, definition in self.USER_SETTINGS_COLUMNS:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE users ADD COLUMN {column} {definition}')
     
     def _migration_003_down(self, conn: sqlite3.Connection):
         """Remove enhanced user settings"""
@@ -293,10 +461,11 @@ class DatabaseMigrator:
     
     def _migration_004_up(self, conn: sqlite3.Connection):
         """Add post reactions and engagement"""
-        cursor = conn.cursor()
-        
-        # Create reactions table
-        cursor.execute('''
+        _execute_script(conn, [
+            # Create reactions table. Rows are small and keyed by a TEXT id, so
+            # WITHOUT ROWID stores them in the primary-key B-tree itself instead
+            # of a rowid table plus a separate PK index
+            '''
             CREATE TABLE IF NOT EXISTS post_reactions (
                 reaction_id TEXT PRIMARY KEY,
                 post_id TEXT NOT NULL,
@@ -306,11 +475,10 @@ class DatabaseMigrator:
                 FOREIGN KEY (post_id) REFERENCES posts (post_id) ON DELETE CASCADE,
                 FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
                 UNIQUE(post_id, user_id, reaction_type)
-            )
-        ''')
-        
-        # Create engagement tracking table
-        cursor.execute('''
+            ) WITHOUT ROWID
+            ''',
+            # Create engagement tracking table (post_id is a TEXT key, as above)
+            '''
             CREATE TABLE IF NOT EXISTS post_engagement (
                 post_id TEXT PRIMARY KEY,
                 view_count INTEGER DEFAULT 0,
@@ -319,19 +487,58 @@ class DatabaseMigrator:
                 share_count INTEGER DEFAULT 0,
                 updated_at REAL NOT NULL,
                 FOREIGN KEY (post_id) REFERENCES posts (post_id) ON DELETE CASCADE
-            )
-        ''')
-        
-        # Add indexes
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_reactions_post ON post_reactions (post_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_reactions_user ON post_reactions (user_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_engagement_updated ON post_engagement (updated_at)')
+            ) WITHOUT ROWID
+            ''',
+            # Add indexes; (post_id, reaction_type) covers per-post counts by type
+            'CREATE INDEX IF NOT EXISTS idx_reactions_post_type ON post_reactions (post_id, reaction_type)',
+            'CREATE INDEX IF NOT EXISTS idx_reactions_user ON post_reactions (user_id)',
+            'CREATE INDEX IF NOT EXISTS idx_engagement_updated ON post_engagement (updated_at)',
+        ])
     
     def _migration_004_down(self, conn: sqlite3.Connection):
         """Remove post reactions and engagement"""
-        cursor = conn.cursor()
-        cursor.execute('DROP TABLE IF EXISTS post_reactions')
-        cursor.execute('DROP TABLE IF EXISTS post_engagement')
+        _execute_script(conn, [
+            'DROP INDEX IF EXISTS idx_reactions_post_type',
+            'DROP INDEX IF EXISTS idx_reactions_post',
+            'DROP TABLE IF EXISTS post_reactions',
+            'DROP TABLE IF EXISTS post_engagement',
+        ])
+    
+    def _migration_005_up(self, conn: sqlite3.Connection):
+        """Add trigger-maintained like counts to posts"""
+        # Likes are comments with the '__LIKE__' sentinel; counting them per request
+        # becomes a single-row read of posts.like_count. Plain execute() calls keep
+        # the conditional ALTER inside the migration transaction.
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(posts)')}
+        if 'like_count' not in existing:
+            conn.execute('ALTER TABLE posts ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0')
+        conn.execute('''
+            UPDATE posts SET like_count = (
+                SELECT COUNT(*) FROM comments
+                WHERE comments.post_id = posts.post_id AND content = '__LIKE__'
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_like_ins AFTER INSERT ON comments
+            WHEN NEW.content = '__LIKE__'
+            BEGIN
+                UPDATE posts SET like_count = like_count + 1 WHERE post_id = NEW.post_id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_like_del AFTER DELETE ON comments
+            WHEN OLD.content = '__LIKE__'
+            BEGIN
+                UPDATE posts SET like_count = like_count - 1 WHERE post_id = OLD.post_id;
+            END
+        ''')
+    
+    def _migration_005_down(self, conn: sqlite3.Connection):
+        """Remove like count triggers"""
+        # The column is left in place, as in migration 003; without the triggers
+        # readers fall back to counting the like comments
+        conn.execute('DROP TRIGGER IF EXISTS trg_like_ins')
+        conn.execute('DROP TRIGGER IF EXISTS trg_like_del')
     
     def status(self) -> Dict:
         """Get migration status"""
@@ -339,14 +546,17 @@ class DatabaseMigrator:
         applied_migrations = self.get_applied_migrations()
         total_migrations = len(self.migrations)
         
+        # Compare against what is actually recorded: a rolled-back migration below
+        # current_version is still pending
+        applied_versions = {m['version'] for m in applied_migrations}
         pending_migrations = [
             m for m in self.migrations 
-            if m['version'] > current_version
+            if m['version'] not in applied_versions
         ]
         
         return {
             'current_version': current_version,
-            'latest_version': max(m['version'] for m in self.migrations) if self.migrations else 0,
+            'latest_version': self._latest_version,
             'applied_count': len(applied_migrations),
             'total_count': total_migrations,
             'pending_count': len(pending_migrations),
@@ -354,27 +564,55 @@ class DatabaseMigrator:
             'pending_migrations': pending_migrations
         }
 
-def run_migrations(db_path: str, target_version: int = None) -> bool:
-    """Run migrations on database"""
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Open db_path in WAL mode so readers are not blocked while migrating"""
+    conn = sqlite3.connect(db_path, cached_statements=256)
+    # WAL is persisted in the database header; in-memory databases stay 'memory'
+    journal_mode = conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+    if journal_mode != 'wal':
+        logger.warning("WAL unavailable for %s, using journal_mode=%s", db_path, journal_mode)
+    # Retry for up to 5s when another connection holds the write lock
+    conn.execute('PRAGMA busy_timeout=5000')
+    return conn
+
+def run_migrations(db: Union[str, sqlite3.Connection], target_version: int = None) -> bool:
+    """Run migrations on database
+
+    db is either a path or an already open connection; a caller's connection
+    is reused as-is and left open.
+    """
     try:
-        conn = sqlite3.connect(db_path)
-        migrator = DatabaseMigrator(conn)
-        
-        if target_version is None:
-            success = migrator.migrate_to_latest()
-        else:
-            success = migrator.migrate_to_version(target_version)
-        
-        conn.close()
-        return success
+        owns_connection = not isinstance(db, sqlite3.Connection)
+        conn = _connect(db) if owns_connection else db
+        try:
+            if owns_connection:
+                # Single-writer bulk mode: the connection is private and closed
+                # below, which releases the exclusive lock
+                conn.execute('PRAGMA locking_mode=EXCLUSIVE')
+            migrator = DatabaseMigrator(conn)
+            
+            if target_version is None:
+                return migrator.migrate_to_latest()
+            return migrator.migrate_to_version(target_version)
+        finally:
+            if owns_connection:
+                try:
+                    conn.execute('PRAGMA optimize')
+                finally:
+                    # Closing also drops the EXCLUSIVE lock, so it must happen even
+                    # if optimize fails
+                    conn.close()
     
     except Exception as e:
-        print(f"Migration error: {e}")
+        logger.error("Migration error: %s", e)
         return False
 
 if __name__ == "__main__":
     import argparse
     
+    # Library callers configure logging themselves; the CLI prints progress lines
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+
     parser = argparse.ArgumentParser(description='Database Migration Tool')
     parser.add_argument('--db', required=True, help='Database file path')
     parser.add_argument('--version', type=int, help='Target version (default: latest)')
@@ -383,9 +621,8 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     if args.status:
-        conn = sqlite3.connect(args.db)
-        migrator = DatabaseMigrator(conn)
-        status = migrator.status()
+        with closing(_connect(args.db)) as conn:
+            status = DatabaseMigrator(conn).status()
         
         print(f"Current version: {status['current_version']}")
         print(f"Latest version:  {status['latest_version']}")
@@ -396,8 +633,6 @@ if __name__ == "__main__":
             print("\nPending migrations:")
             for migration in status['pending_migrations']:
                 print(f"  {migration['version']:3d}: {migration['name']}")
-        
-        conn.close()
     else:
         success = run_migrations(args.db, args.version)
         exit(0 if success else 1)
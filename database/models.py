@@ -3,8 +3,44 @@ from typing import List, Dict, Optional, Any
 import time
 import json
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    orjson = None
+
+_loads = orjson.loads if orjson else json.loads
+
+# Explicit __slots__ (dataclass(slots=True) needs Python 3.10) drop the per-row
+# instance __dict__; these objects are created once per fetched row.
+
+class _LazyJSON:
+    """Field that accepts a parsed value or the raw JSON column text
+
+    Raw text is parsed on first access and the result kept in the backing
+    slot, so rows whose JSON is never read skip decoding entirely.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.slot = f'_{name}'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            # Not a dataclass default: the field stays a required argument
+            raise AttributeError(self.name)
+        value = getattr(instance, self.slot)
+        if value is None or isinstance(value, (str, bytes)):
+            value = _loads(value) if value else {}
+            setattr(instance, self.slot, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
+
 @dataclass
 class User:
+    __slots__ = ('user_id', 'name', 'bio', 'public_key', 'private_key_encrypted',
+                 'created_at', 'updated_at', '_preferences')
     user_id: str
     name: str
     bio: str
@@ -12,10 +48,12 @@ class User:
     private_key_encrypted: str
     created_at: float
     updated_at: float
-    preferences: Dict[str, Any]
+    preferences: Dict[str, Any] = _LazyJSON()
 
 @dataclass
 class Post:
+    __slots__ = ('post_id', 'user_id', 'content', 'media_urls', 'privacy_level',
+                 'created_at', 'updated_at', '_metadata')
     post_id: str
     user_id: str
     content: str
@@ -23,21 +61,25 @@ class Post:
     privacy_level: str  # 'public', 'friends', 'private'
     created_at: float
     updated_at: float
-    metadata: Dict[str, Any]
+    metadata: Dict[str, Any] = _LazyJSON()
 
 @dataclass
 class Connection:
+    __slots__ = ('connection_id', 'user_id', 'peer_user_id', 'peer_public_key',
+                 'connection_status', '_permissions', 'created_at', 'updated_at')
     connection_id: str
     user_id: str
     peer_user_id: str
     peer_public_key: str
     connection_status: str  # 'pending', 'accepted', 'blocked'
-    permissions: Dict[str, bool]  # {'view': True, 'comment': True, 'share': False}
+    permissions: Dict[str, bool] = _LazyJSON()  # {'view': True, 'comment': True, 'share': False}
     created_at: float
     updated_at: float
 
 @dataclass
 class Comment:
+    __slots__ = ('comment_id', 'post_id', 'author_id', 'content', 'created_at',
+                 'is_encrypted')
     comment_id: str
     post_id: str
     author_id: str
@@ -47,6 +89,8 @@ class Comment:
 
 @dataclass
 class MediaFile:
+    __slots__ = ('file_id', 'user_id', 'filename', 'file_path', 'file_type',
+                 'file_size', 'is_encrypted', 'created_at', '_metadata')
     file_id: str
     user_id: str
     filename: str
@@ -55,4 +99,4 @@ class MediaFile:
     file_size: int
     is_encrypted: bool
     created_at: float
-    metadata: Dict[str, Any]
+    metadata: Dict[str, Any] = _LazyJSON()
@@ -3,12 +3,13 @@
 Launch script for Decentralized Social Media Platform
 """
 
-import os
 import sys
 from pathlib import Path
 
 # Add current directory to Python path
-sys.path.insert(0, str(Path(__file__).parent))
+project_root = str(Path(__file__).parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
 if __name__ == "__main__":
     from main import main
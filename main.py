@@ -7,36 +7,33 @@ Licensed under GNU General Public License v3.0
 import sys
 import os
 import argparse
-import time
+import importlib.util
 import json
+import threading
+import signal
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# Add the project root to Python path
-sys.path.insert(0, str(Path(__file__).parent))
+# Add the project root to Python path (launch.py may already have done so)
+PROJECT_ROOT = str(Path(__file__).parent)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+DB_MAINTENANCE_INTERVAL = 3600  # seconds between incremental vacuum + ANALYZE runs
 
 def check_dependencies():
     """Check if all required dependencies are available"""
     missing_deps = []
     
-    try:
-        from cryptography.fernet import Fernet
-    except ImportError:
-        missing_deps.append("cryptography")
-    
-    try:
-        import qrcode
-    except ImportError:
-        missing_deps.append("qrcode")
-    
-    try:
-        import netifaces
-    except ImportError:
-        missing_deps.append("netifaces")
-    
-    try:
-        from jinja2 import Environment
-    except ImportError:
-        missing_deps.append("jinja2")
+    # find_spec locates each package without executing it; load_components does
+    # the real import once the check passes
+    for module in ('cryptography.fernet', 'qrcode', 'netifaces', 'jinja2'):
+        try:
+            found = importlib.util.find_spec(module) is not None
+        except ImportError:  # parent package of a dotted name is missing
+            found = False
+        if not found:
+            missing_deps.append(module.split('.')[0])
     
     if missing_deps:
         print("ERROR: Missing required dependencies:")
@@ -85,47 +82,50 @@ class DecentralizedSocialApp:
         self.address_manager = None
         self.qr_generator = None
         self.web_interface = None
+        self._maintenance_stop = threading.Event()
         
     def initialize(self, user_password: str = None):
         """Initialize all components"""
         print("Initializing Decentralized Social Media Platform...")
         
-        # Initialize encryption
-        self.encryption = self.EncryptionEngine(user_password)
+        storage_path = self.config.get('storage_path', './user_data')
+
+        # Initialize encryption (KDF parameters persist in the sandbox keys/ directory)
+        keyfile_path = os.path.join(storage_path, 'keys', 'kdf.json')
+        self.encryption = self.EncryptionEngine(user_password, keyfile_path=keyfile_path)
         print("✓ Encryption engine initialized")
-        
+
         # Initialize storage
-        storage_path = self.config.get('storage_path', './user_data')
         self.storage = self.SandboxedStorage(storage_path, self.encryption)
         print("✓ Storage system initialized")
         
-        # Initialize database
-        db_path = self.storage.get_sandbox_path('database') / 'local.db'
-        self.database = self.LocalDatabase(str(db_path))
-        print("✓ Database initialized")
+        # The remaining components only depend on config and storage paths, so
+        # resolve those here and construct them concurrently
+        db_path = os.path.join(self.storage.get_sandbox_str('database'), 'local.db')
+        template_path = self.storage.get_sandbox_str('templates')
+        www_path = self.storage.get_sandbox_str('www')
+        web_port = self.config.get('web_port', 8080)
+        p2p_port = self.config.get('p2p_port', 9999)
         
-        # Initialize template engine
-        template_path = self.storage.get_sandbox_path('templates')
-        self.template_engine = self.SiteTemplateEngine(str(template_path))
-        print("✓ Template engine initialized")
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            database = pool.submit(self.LocalDatabase, db_path)
+            template_engine = pool.submit(self.SiteTemplateEngine, template_path)
+            address_manager = pool.submit(self.DynamicAddressManager, web_port)
+            qr_generator = pool.submit(self.QRCodeGenerator)
+            web_server = pool.submit(self.LocalWebServer, web_port, www_path)
+            p2p_node = pool.submit(self.P2PNode, p2p_port)
         
-        # Initialize address manager
-        web_port = self.config.get('web_port', 8080)
-        self.address_manager = self.DynamicAddressManager(web_port)
+        self.database = database.result()
+        print("✓ Database initialized")
+        self.template_engine = template_engine.result()
+        print("✓ Template engine initialized")
+        self.address_manager = address_manager.result()
         print("✓ Address manager initialized")
-        
-        # Initialize QR generator
-        self.qr_generator = self.QRCodeGenerator()
+        self.qr_generator = qr_generator.result()
         print("✓ QR code generator initialized")
-        
-        # Initialize web server
-        www_path = self.storage.get_sandbox_path('www')
-        self.web_server = self.LocalWebServer(web_port, str(www_path))
+        self.web_server = web_server.result()
         print("✓ Web server initialized")
-        
-        # Initialize P2P node
-        p2p_port = self.config.get('p2p_port', 9999)
-        self.p2p_node = self.P2PNode(p2p_port)
+        self.p2p_node = p2p_node.result()
         print("✓ P2P node initialized")
         
         # Initialize web interface
@@ -155,6 +155,11 @@ class DecentralizedSocialApp:
         self.p2p_node.start_node()
         print(f"✓ P2P node started on port {self.p2p_node.port}")
         
+        # Keep the database compact and its planner statistics fresh
+        maintenance_thread = threading.Thread(target=self._run_database_maintenance)
+        maintenance_thread.daemon = True
+        maintenance_thread.start()
+        
         # Update and display addresses
         addresses = self.address_manager.update_current_addresses()
         print("\n" + "="*50)
@@ -169,9 +174,17 @@ class DecentralizedSocialApp:
         
         return True
     
+    def _run_database_maintenance(self):
+        while not self._maintenance_stop.wait(DB_MAINTENANCE_INTERVAL):
+            try:
+                self.database.maintenance_tick()
+            except Exception as e:
+                print(f"Database maintenance failed: {e}")
+    
     def stop(self):
         """Stop all services"""
         print("\nShutting down services...")
+        self._maintenance_stop.set()
         if self.web_server:
             self.web_server.stop_server()
             print("✓ Web server stopped")
@@ -183,6 +196,26 @@ class DecentralizedSocialApp:
             print("✓ Database closed")
         print("All services stopped")
 
+def wait_for_shutdown():
+    """Block until SIGINT/SIGTERM without waking the interpreter in between"""
+    stop_event = threading.Event()
+    
+    def request_stop(signum, frame):
+        stop_event.set()
+    
+    signal.signal(signal.SIGINT, request_stop)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, request_stop)
+    
+    if hasattr(signal, 'pause'):
+        # Parks the main thread in pause(2) until a signal arrives
+        while not stop_event.is_set():
+            signal.pause()
+    else:
+        # Windows can't interrupt an untimed wait, so poll the event instead
+        while not stop_event.wait(1):
+            pass
+
 def main():
     if not check_dependencies():
         return False
@@ -194,9 +227,12 @@ def main():
         app.start()
         
         print("Press Ctrl+C to stop the server...")
-        while True:
-            time.sleep(1)
-            
+        wait_for_shutdown()
+        
+        print("\nShutting down...")
+        app.stop()
+        sys.exit(0)
+        
     except KeyboardInterrupt:
         print("\nShutting down...")
         app.stop()
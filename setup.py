@@ -10,6 +10,19 @@ import subprocess
 from pathlib import Path
 import json
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, and not installed yet on a first run
+    orjson = None
+
+def write_json_file(path, data):
+    """Write data to a file as indented JSON"""
+    if orjson:
+        Path(path).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
 def check_python_version():
     """Check if Python version is compatible"""
     if sys.version_info < (3, 8):
@@ -21,15 +34,15 @@ def check_python_version():
 def install_dependencies():
     """Install required Python packages"""
     print("Installing dependencies...")
-    requirements_file = Path(__file__).parent / "requirements.txt"
+    requirements_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.txt")
     
-    if not requirements_file.exists():
+    if not os.path.isfile(requirements_file):
         print("ERROR: requirements.txt not found")
         return False
     
     try:
         subprocess.run([
-            sys.executable, "-m", "pip", "install", "-r", str(requirements_file)
+            sys.executable, "-m", "pip", "install", "-r", requirements_file
         ], check=True)
         print("Dependencies installed successfully!")
         return True
@@ -49,9 +62,24 @@ def create_directory_structure():
         "logs"
     ]
     
+    # One scandir per parent says which directories already exist, instead of a
+    # stat per directory; parents created here are known to be empty
+    listed = {}
     for directory in directories:
-        path = Path(directory)
-        path.mkdir(parents=True, exist_ok=True)
+        parent, name = os.path.split(directory)
+        parent = parent or "."
+        if parent not in listed:
+            try:
+                with os.scandir(parent) as entries:
+                    listed[parent] = {entry.name for entry in entries if entry.is_dir()}
+            except FileNotFoundError:
+                listed[parent] = set()
+        if name in listed[parent]:
+            continue
+        
+        os.makedirs(directory, exist_ok=True)
+        listed[parent].add(name)
+        listed[directory] = set()
         print(f"Created directory: {directory}")
 
 def create_default_config():
@@ -68,8 +96,7 @@ def create_default_config():
     
     config_path = Path("config.json")
     if not config_path.exists():
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=2)
+        write_json_file(config_path, config)
         print("Created default configuration: config.json")
     else:
         print("Configuration file already exists: config.json")
@@ -127,8 +154,7 @@ def setup_initial_user():
     }
     
     user_config_path = Path("user_data/user_config.json")
-    with open(user_config_path, 'w') as f:
-        json.dump(user_config, f, indent=2)
+    write_json_file(user_config_path, user_config)
     
     print(f"Initial user setup complete for: {name}")
     return True
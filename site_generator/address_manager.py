@@ -1,21 +1,73 @@
 import socket
 import netifaces
 import hashlib
+import re
 import time
+import urllib.request
+from functools import lru_cache
 from typing import List, Dict, Optional
 
+try:
+    import urllib3
+except ImportError:  # urllib3 is optional, fall back to a one-off urlopen
+    urllib3 = None
+
+LOCAL_ADDRESS_TTL = 10.0  # seconds an interface scan is reused
+# Loopback, container and VM bridges never carry an address peers can reach
+_SKIPPED_INTERFACES = re.compile(r'^(lo|docker|br-|veth|vmnet)')
+# Loopback and link-local addresses are never reachable by other hosts
+_NON_SHAREABLE_PREFIXES = ('127.', '169.254.', '::1', 'fe80:')
+
+EXTERNAL_IP_URL = 'https://api.ipify.org'
+EXTERNAL_IP_TTL = 300  # seconds a looked-up external address is reused
+EXTERNAL_IP_BACKOFF = (30, 600)  # first and maximum wait after a failed lookup
+
+# One pooled connection keeps the socket, TLS session and DNS answer between lookups
+_HTTP = urllib3.PoolManager(
+    num_pools=1, timeout=urllib3.Timeout(connect=2.0, read=3.0), retries=False
+) if urllib3 else None
+
+def _fetch_external_ip() -> str:
+    if _HTTP is not None:
+        response = _HTTP.request('GET', EXTERNAL_IP_URL)
+        if response.status != 200:
+            raise OSError(f"HTTP {response.status} from {EXTERNAL_IP_URL}")
+        return response.data.decode('utf8')
+    return urllib.request.urlopen(EXTERNAL_IP_URL, timeout=5).read().decode('utf8')
+
+@lru_cache(maxsize=1024)
+def _address_id(address: str) -> str:
+    # Non-security fingerprint: an 8-byte BLAKE2b digest is exactly 16 hex chars
+    return hashlib.blake2b(address.encode(), digest_size=8).hexdigest()
+
 class DynamicAddressManager:
     def __init__(self, base_port: int = 8080):
         self.base_port = base_port
         self.current_addresses = []
         self.address_history = []
+        self._history_ids = set()  # ids already in address_history
+        self._shareable = []  # shareable subset of _shareable_for
+        self._shareable_for = self.current_addresses
+        self._url_template = f"http://{{}}:{base_port}".format
+        self._addr_cache = None  # last interface scan and when it ran
+        self._addr_ts = 0.0
+        self._ext_ip_cache = None  # last external address and when it was looked up
+        self._ext_ip_ts = 0.0
+        self._ext_ip_retry_at = 0.0  # no lookups before this after a failure
+        self._ext_ip_backoff = 0
     
     def get_local_addresses(self) -> List[Dict[str, str]]:
         """Get all local IP addresses"""
+        now = time.monotonic()
+        if self._addr_cache is not None and now - self._addr_ts < LOCAL_ADDRESS_TTL:
+            return [dict(addr) for addr in self._addr_cache]
+        
         addresses = []
         
-        # Get all network interfaces
+        # Get all network interfaces, querying only the ones worth sharing
         for interface in netifaces.interfaces():
+            if _SKIPPED_INTERFACES.match(interface):
+                continue
             try:
                 interface_info = netifaces.ifaddresses(interface)
                 if netifaces.AF_INET in interface_info:
@@ -26,34 +78,47 @@ class DynamicAddressManager:
                                 'interface': interface,
                                 'ip': ip,
                                 'port': self.base_port,
-                                'url': f"http://{ip}:{self.base_port}",
+                                'url': self._url_template(ip),
                                 'timestamp': time.time()
                             })
             except Exception as e:
                 print(f"Error getting addresses for interface {interface}: {e}")
         
-        return addresses
+        self._addr_cache = addresses
+        self._addr_ts = now
+        return [dict(addr) for addr in addresses]
     
     def get_external_address(self) -> Optional[Dict[str, str]]:
         """Get external IP address (requires internet connection)"""
+        now = time.monotonic()
+        if self._ext_ip_cache and now - self._ext_ip_ts < EXTERNAL_IP_TTL:
+            return dict(self._ext_ip_cache)
+        if now < self._ext_ip_retry_at:
+            return None  # still backing off from a failed lookup
+        
         try:
-            # Simple method to get external IP
-            import urllib.request
-            external_ip = urllib.request.urlopen('https://api.ipify.org').read().decode('utf8')
-            return {
-                'type': 'external',
-                'ip': external_ip,
-                'port': self.base_port,
-                'url': f"http://{external_ip}:{self.base_port}",
-                'timestamp': time.time()
-            }
+            external_ip = _fetch_external_ip()
         except Exception as e:
             print(f"Could not determine external IP: {e}")
+            first, maximum = EXTERNAL_IP_BACKOFF
+            self._ext_ip_backoff = min(self._ext_ip_backoff * 2, maximum) if self._ext_ip_backoff else first
+            self._ext_ip_retry_at = now + self._ext_ip_backoff
             return None
+        
+        self._ext_ip_backoff = 0
+        self._ext_ip_cache = {
+            'type': 'external',
+            'ip': external_ip,
+            'port': self.base_port,
+            'url': f"http://{external_ip}:{self.base_port}",
+            'timestamp': time.time()
+        }
+        self._ext_ip_ts = now
+        return dict(self._ext_ip_cache)
     
     def generate_address_id(self, address: str) -> str:
         """Generate a unique ID for an address"""
-        return hashlib.sha256(address.encode()).hexdigest()[:16]
+        return _address_id(address)
     
     def update_current_addresses(self) -> List[Dict[str, str]]:
         """Update and return current addresses"""
@@ -64,19 +129,25 @@ class DynamicAddressManager:
         if external_address:
             all_addresses.append(external_address)
         
-        # Add address IDs
+        # Add address IDs, record addresses not seen before and pick out the shareable ones
+        shareable = []
         for addr in all_addresses:
             addr['id'] = self.generate_address_id(addr['url'])
-        
-        # Update history
-        for addr in all_addresses:
-            if addr not in self.address_history:
+            if addr['id'] not in self._history_ids:
+                self._history_ids.add(addr['id'])
                 self.address_history.append(addr)
+            if not addr['ip'].startswith(_NON_SHAREABLE_PREFIXES):
+                shareable.append(addr)
         
-        self.current_addresses = all_addresses
+        self.current_addresses = self._shareable_for = all_addresses
+        self._shareable = shareable
         return all_addresses
     
     def get_shareable_addresses(self) -> List[Dict[str, str]]:
         """Get addresses that can be shared with others"""
-        return [addr for addr in self.current_addresses 
-                if not addr['ip'].startswith('127.')]
+        # Recomputed only when current_addresses was replaced outside update_current_addresses
+        if self._shareable_for is not self.current_addresses:
+            self._shareable = [addr for addr in self.current_addresses
+                               if not addr['ip'].startswith(_NON_SHAREABLE_PREFIXES)]
+            self._shareable_for = self.current_addresses
+        return list(self._shareable)
@@ -3,34 +3,132 @@
 Interaction handler for comments, likes, and other user interactions
 """
 
+import os
 import time
-import json
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+from collections import OrderedDict, defaultdict
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional
+
+INTERACTION_CACHE_SIZE = 8192  # entries per LRU cache in InteractionHandler
+
+_REPLY_PREFIX = '@reply:'  # replies are stored as "@reply:<parent_id>:<content>"
+_REPLY_PREFIX_LEN = len(_REPLY_PREFIX)
+
+_EMPTY_METADATA = MappingProxyType({})
 
-@dataclass
 class Interaction:
-    interaction_id: str
-    user_id: str
-    target_id: str  # post_id, comment_id, etc.
-    interaction_type: str  # 'like', 'comment', 'share', 'reply'
-    content: str = ""
-    metadata: Dict[str, Any] = None
-    created_at: float = 0.0
+    """A single like, comment, share or reply
+
+    A plain class with __slots__ rather than a dataclass: slotted dataclasses
+    can't take field defaults before Python 3.10. Metadata stays None until
+    something is stored in it.
+    """
+    __slots__ = ('interaction_id', 'user_id', 'target_id', 'interaction_type',
+                 'content', 'metadata', 'created_at')
+    
+    def __init__(self, interaction_id: str, user_id: str, target_id: str,
+                 interaction_type: str, content: str = "",
+                 metadata: Optional[Dict[str, Any]] = None, created_at: float = 0.0):
+        self.interaction_id = interaction_id
+        self.user_id = user_id
+        self.target_id = target_id  # post_id, comment_id, etc.
+        self.interaction_type = interaction_type  # 'like', 'comment', 'share', 'reply'
+        self.content = content
+        self.metadata = metadata
+        self.created_at = created_at or time.time()
     
-    def __post_init__(self):
-        if self.created_at == 0.0:
-            self.created_at = time.time()
-        if self.metadata is None:
-            self.metadata = {}
+    @property
+    def metadata_or_empty(self) -> Mapping[str, Any]:
+        """Metadata for reading, without allocating a dict when there is none"""
+        return self.metadata if self.metadata is not None else _EMPTY_METADATA
+    
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'Interaction({fields})'
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
 
 class InteractionHandler:
     """Handle user interactions like comments, likes, shares"""
     
+    # Likes are comments with a sentinel content, so every like lookup filters
+    # on (post_id|author_id, content); these turn those scans into index probes
+    INDEXES = (
+        'CREATE INDEX IF NOT EXISTS idx_comments_post_like ON comments (post_id, content)',
+        'CREATE INDEX IF NOT EXISTS idx_comments_author_like ON comments (author_id, content)',
+    )
+    
+    # One round trip; each scalar subquery still gets its own index lookup,
+    # which a single pass over comments LEFT JOIN posts would give up
+    USER_SUMMARY_SQL = '''
+        SELECT
+            (SELECT COUNT(*) FROM comments
+             WHERE author_id = ? AND content = '__LIKE__'),
+            (SELECT COUNT(*) FROM comments
+             WHERE author_id = ? AND content != '__LIKE__'),
+            (SELECT COUNT(*) FROM comments c
+             JOIN posts p ON c.post_id = p.post_id
+             WHERE p.user_id = ? AND c.content = '__LIKE__'),
+            (SELECT COUNT(*) FROM comments c
+             JOIN posts p ON c.post_id = p.post_id
+             WHERE p.user_id = ? AND c.content != '__LIKE__' AND c.author_id != ?)
+    '''
+    
+    # Migration 005 keeps posts.like_count in step with like comments via triggers
+    LIKE_COUNT_TRIGGER_EXISTS_SQL = (
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_like_ins'"
+    )
+    LIKE_COUNT_SQL = 'SELECT like_count FROM posts WHERE post_id = ?'
+    COUNT_LIKES_SQL = '''
+        SELECT COUNT(*) FROM comments 
+        WHERE post_id = ? AND content = '__LIKE__'
+    '''
+    
+    INSERT_REPLY_SQL = '''
+        INSERT INTO comments (comment_id, post_id, author_id, content, created_at, is_encrypted)
+        SELECT ?, post_id, ?, ?, ?, 0 FROM comments WHERE comment_id = ?
+    '''
+    
+    # Rate limits per minute, as (slot in the user's rate state, limit)
+    RATE_LIMITS = {
+        'like': (0, 30),     # 30 likes per minute
+        'comment': (1, 10),  # 10 comments per minute
+        'share': (2, 5)      # 5 shares per minute
+    }
+    
     def __init__(self, database):
         self.database = database
-        self.interaction_cache = {}
-        self.rate_limits = {}  # user_id -> {last_action: timestamp, count: int}
+        # LRU cache kept in step by add_like/remove_like instead of being invalidated
+        self.interaction_cache = OrderedDict()  # (user_id, post_id) -> has liked
+        self.rate_limits = OrderedDict()  # user_id -> [window start (monotonic), count] per action
+        
+        for index_sql in self.INDEXES:
+            self.database.connection.execute(index_sql)
+        self.database.connection.commit()
+        
+        # Unmigrated databases have no like_count column and still count rows
+        self._has_like_counts = bool(
+            self.database.connection.execute(self.LIKE_COUNT_TRIGGER_EXISTS_SQL).fetchone()
+        )
+    
+    @staticmethod
+    def _cache_get(cache: OrderedDict, key):
+        """Look up a value and mark it as most recently used"""
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+    
+    @staticmethod
+    def _cache_put(cache: OrderedDict, key, value):
+        """Store a value as most recently used, evicting the oldest past the size limit"""
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > INTERACTION_CACHE_SIZE:
+            cache.popitem(last=False)
     
     def add_like(self, user_id: str, post_id: str) -> bool:
         """Add a like to a post"""
@@ -54,8 +152,7 @@ class InteractionHandler:
             )
             
             # Update cache
-            cache_key = f"{user_id}:{post_id}:like"
-            self.interaction_cache[cache_key] = True
+            self._cache_put(self.interaction_cache, (user_id, post_id), True)
             
             self._update_rate_limit(user_id, 'like')
             return True
@@ -64,6 +161,51 @@ class InteractionHandler:
             print(f"Error adding like: {e}")
             return False
     
+    def add_likes_bulk(self, user_id: str, post_ids: List[str]) -> List[str]:
+        """Like several posts in one transaction, returning the post IDs newly liked
+
+        Posts already liked are skipped and the batch is trimmed to what is
+        left of the user's rate limit.
+        """
+        if not self._check_rate_limit(user_id, 'like'):
+            return []
+        
+        try:
+            pending = [post_id for post_id in dict.fromkeys(post_ids)
+                       if not self._cache_get(self.interaction_cache, (user_id, post_id))]
+            uncached = [post_id for post_id in pending
+                        if (user_id, post_id) not in self.interaction_cache]
+            if uncached:
+                placeholders = ','.join('?' * len(uncached))
+                liked = {row[0] for row in self.database.connection.execute(
+                    f"SELECT post_id FROM comments WHERE author_id = ? AND content = '__LIKE__' "
+                    f"AND post_id IN ({placeholders})", (user_id, *uncached))}
+                pending = [post_id for post_id in pending if post_id not in liked]
+                for post_id in liked:
+                    self._cache_put(self.interaction_cache, (user_id, post_id), True)
+            
+            slot, limit = self.RATE_LIMITS['like']
+            remaining = limit - self.rate_limits[user_id][slot][1]
+            pending = pending[:remaining]
+            if not pending:
+                return []
+            
+            # One executemany and one commit for the whole batch
+            self.database.create_comments_bulk(
+                {'post_id': post_id, 'author_id': user_id, 'content': '__LIKE__'}
+                for post_id in pending
+            )
+            
+            for post_id in pending:
+                self._cache_put(self.interaction_cache, (user_id, post_id), True)
+            
+            self._update_rate_limit(user_id, 'like', len(pending))
+            return pending
+            
+        except Exception as e:
+            print(f"Error adding likes: {e}")
+            return []
+    
     def remove_like(self, user_id: str, post_id: str) -> bool:
         """Remove a like from a post"""
         try:
@@ -77,9 +219,7 @@ class InteractionHandler:
             self.database.connection.commit()
             
             # Update cache
-            cache_key = f"{user_id}:{post_id}:like"
-            if cache_key in self.interaction_cache:
-                del self.interaction_cache[cache_key]
+            self._cache_put(self.interaction_cache, (user_id, post_id), False)
             
             return cursor.rowcount > 0
             
@@ -96,26 +236,19 @@ class InteractionHandler:
             return None
         
         try:
-            # Get the parent comment to find the post
-            parent_comment = self.database.connection.cursor()
-            parent_comment.execute('SELECT post_id FROM comments WHERE comment_id = ?', (parent_comment_id,))
-            result = parent_comment.fetchone()
-            
-            if not result:
-                return None
-            
-            post_id = result[0]
+            # The reply takes its post_id from the parent row in the same statement;
+            # no row is inserted when the parent doesn't exist
+            reply_id = self._generate_interaction_id()
+            reply_content = f"{_REPLY_PREFIX}{parent_comment_id}:{content}"
             
-            # Create reply with metadata indicating parent
-            metadata = {'parent_comment_id': parent_comment_id, 'is_reply': True}
-            reply_content = f"@reply:{parent_comment_id}:{content}"
+            with self.database.connection:
+                cursor = self.database.connection.execute(
+                    self.INSERT_REPLY_SQL,
+                    (reply_id, user_id, reply_content, time.time(), parent_comment_id)
+                )
             
-            reply_id = self.database.create_comment(
-                post_id=post_id,
-                author_id=user_id,
-                content=reply_content,
-                is_encrypted=False
-            )
+            if cursor.rowcount != 1:
+                return None
             
             self._update_rate_limit(user_id, 'comment')
             return reply_id
@@ -126,15 +259,18 @@ class InteractionHandler:
     
     def get_post_likes_count(self, post_id: str) -> int:
         """Get number of likes for a post"""
+        # Read per call: likes also change through delete_post, other handlers
+        # and peer sync, so no in-process count could be kept current
         try:
-            cursor = self.database.connection.cursor()
-            cursor.execute('''
-                SELECT COUNT(*) FROM comments 
-                WHERE post_id = ? AND content = '__LIKE__'
-            ''', (post_id,))
-            
-            result = cursor.fetchone()
-            return result[0] if result else 0
+            if self._has_like_counts:
+                result = self.database.connection.execute(
+                    self.LIKE_COUNT_SQL, (post_id,)).fetchone()
+                if result is not None:
+                    return result[0]
+            # No posts row to keep a count on, e.g. a peer's post that was never
+            # stored locally; its like comments are still counted
+            return self.database.connection.execute(
+                self.COUNT_LIKES_SQL, (post_id,)).fetchone()[0]
             
         except Exception as e:
             print(f"Error getting likes count: {e}")
@@ -143,28 +279,21 @@ class InteractionHandler:
     def get_post_interactions(self, post_id: str) -> Dict[str, Any]:
         """Get all interactions for a post"""
         try:
-            # Get regular comments (not likes)
             comments = self.database.get_post_comments(post_id)
-            regular_comments = [c for c in comments if c.content != '__LIKE__']
             
-            # Get likes count
-            likes_count = self.get_post_likes_count(post_id)
-            
-            # Process replies
-            replies_by_parent = {}
+            # One pass: count likes, and group replies under their parent
+            likes_count = 0
+            replies_by_parent = defaultdict(list)
             processed_comments = []
             
-            for comment in regular_comments:
-                if comment.content.startswith('@reply:'):
+            for comment in comments:
+                content = comment.content
+                if content == '__LIKE__':
+                    likes_count += 1
+                elif content.startswith(_REPLY_PREFIX):
                     # This is a reply
-                    parts = comment.content.split(':', 3)
-                    if len(parts) >= 4:
-                        parent_id = parts[1]
-                        reply_content = parts[3]
-                        
-                        if parent_id not in replies_by_parent:
-                            replies_by_parent[parent_id] = []
-                        
+                    parent_id, _, reply_content = content[_REPLY_PREFIX_LEN:].partition(':')
+                    if parent_id and reply_content:
                         replies_by_parent[parent_id].append({
                             'comment_id': comment.comment_id,
                             'author_id': comment.author_id,
@@ -172,20 +301,22 @@ class InteractionHandler:
                             'created_at': comment.created_at
                         })
                 else:
-                    # Regular comment
+                    # Regular comment; its replies list fills in as they are reached
                     processed_comments.append({
                         'comment_id': comment.comment_id,
                         'author_id': comment.author_id,
-                        'content': comment.content,
+                        'content': content,
                         'created_at': comment.created_at,
-                        'replies': replies_by_parent.get(comment.comment_id, [])
+                        'replies': replies_by_parent[comment.comment_id]
                     })
             
+            comments_count = len(comments) - likes_count
+            
             return {
                 'likes_count': likes_count,
-                'comments_count': len(regular_comments),
+                'comments_count': comments_count,
                 'comments': processed_comments,
-                'total_interactions': likes_count + len(regular_comments)
+                'total_interactions': likes_count + comments_count
             }
             
         except Exception as e:
@@ -200,37 +331,11 @@ class InteractionHandler:
     def get_user_interactions_summary(self, user_id: str) -> Dict[str, int]:
         """Get summary of user's interactions"""
         try:
-            cursor = self.database.connection.cursor()
-            
-            # Count likes given
-            cursor.execute('''
-                SELECT COUNT(*) FROM comments 
-                WHERE author_id = ? AND content = '__LIKE__'
-            ''', (user_id,))
-            likes_given = cursor.fetchone()[0]
-            
-            # Count comments made
-            cursor.execute('''
-                SELECT COUNT(*) FROM comments 
-                WHERE author_id = ? AND content != '__LIKE__'
-            ''', (user_id,))
-            comments_made = cursor.fetchone()[0]
-            
-            # Count likes received (on user's posts)
-            cursor.execute('''
-                SELECT COUNT(*) FROM comments c
-                JOIN posts p ON c.post_id = p.post_id
-                WHERE p.user_id = ? AND c.content = '__LIKE__'
-            ''', (user_id,))
-            likes_received = cursor.fetchone()[0]
-            
-            # Count comments received (on user's posts)
-            cursor.execute('''
-                SELECT COUNT(*) FROM comments c
-                JOIN posts p ON c.post_id = p.post_id
-                WHERE p.user_id = ? AND c.content != '__LIKE__' AND c.author_id != ?
-            ''', (user_id, user_id))
-            comments_received = cursor.fetchone()[0]
+            likes_given, comments_made, likes_received, comments_received = (
+                self.database.connection.execute(
+                    self.USER_SUMMARY_SQL, (user_id, user_id, user_id, user_id, user_id)
+                ).fetchone()
+            )
             
             return {
                 'likes_given': likes_given,
@@ -252,79 +357,65 @@ class InteractionHandler:
     
     def _check_rate_limit(self, user_id: str, action_type: str) -> bool:
         """Check if user is within rate limits"""
-        current_time = time.time()
-        
-        # Rate limits per minute
-        limits = {
-            'like': 30,      # 30 likes per minute
-            'comment': 10,   # 10 comments per minute
-            'share': 5       # 5 shares per minute
-        }
-        
-        if action_type not in limits:
+        rate = self.RATE_LIMITS.get(action_type)
+        if rate is None:
             return True
+        slot, limit = rate
         
-        key = f"{user_id}:{action_type}"
-        if key not in self.rate_limits:
-            self.rate_limits[key] = {'last_reset': current_time, 'count': 0}
+        now = time.monotonic()
+        state = self._cache_get(self.rate_limits, user_id)
+        if state is None:
+            # A window opens on its action's first check, not on the user's first action
+            state = [[float('-inf'), 0] for _ in self.RATE_LIMITS]
+            self._cache_put(self.rate_limits, user_id, state)
         
-        rate_data = self.rate_limits[key]
-        
-        # Reset counter if more than a minute has passed
-        if current_time - rate_data['last_reset'] > 60:
-            rate_data['count'] = 0
-            rate_data['last_reset'] = current_time
+        # Each action has its own window, so a burst of one doesn't move the others
+        window = state[slot]
+        if now - window[0] > 60:
+            # Reset counter if more than a minute has passed
+            window[0] = now
+            window[1] = 0
         
         # Check if within limit
-        return rate_data['count'] < limits[action_type]
+        return window[1] < limit
     
-    def _update_rate_limit(self, user_id: str, action_type: str):
+    def _update_rate_limit(self, user_id: str, action_type: str, count: int = 1):
         """Update rate limit counter"""
-        key = f"{user_id}:{action_type}"
-        if key in self.rate_limits:
-            self.rate_limits[key]['count'] += 1
+        state = self.rate_limits.get(user_id)
+        rate = self.RATE_LIMITS.get(action_type)
+        if state is not None and rate is not None:
+            state[rate[0]][1] += count
     
     def _user_has_interacted(self, user_id: str, target_id: str, interaction_type: str) -> bool:
         """Check if user has already performed this interaction"""
-        cache_key = f"{user_id}:{target_id}:{interaction_type}"
+        if interaction_type != 'like':
+            return False
         
         # Check cache first
-        if cache_key in self.interaction_cache:
-            return self.interaction_cache[cache_key]
+        cache_key = (user_id, target_id)
+        has_interacted = self._cache_get(self.interaction_cache, cache_key)
+        if has_interacted is not None:
+            return has_interacted
         
         # Check database
-        if interaction_type == 'like':
-            try:
-                cursor = self.database.connection.cursor()
-                cursor.execute('''
-                    SELECT COUNT(*) FROM comments 
-                    WHERE post_id = ? AND author_id = ? AND content = '__LIKE__'
-                ''', (target_id, user_id))
-                
-                count = cursor.fetchone()[0]
-                has_interacted = count > 0
-                
-                # Cache result
-                self.interaction_cache[cache_key] = has_interacted
-                return has_interacted
-                
-            except Exception:
-                return False
-        
-        return False
+        try:
+            cursor = self.database.connection.cursor()
+            cursor.execute('''
+                SELECT COUNT(*) FROM comments 
+                WHERE post_id = ? AND author_id = ? AND content = '__LIKE__'
+            ''', (target_id, user_id))
+            
+            count = cursor.fetchone()[0]
+            has_interacted = count > 0
+            
+            # Cache result
+            self._cache_put(self.interaction_cache, cache_key, has_interacted)
+            return has_interacted
+            
+        except Exception:
+            return False
     
     def _generate_interaction_id(self) -> str:
         """Generate unique interaction ID"""
-        import uuid
-        return str(uuid.uuid4())
-    
-    def cleanup_old_cache_entries(self, max_age_hours: int = 24):
-        """Clean up old cache entries"""
-        # This is a simple implementation
-        # In a production system, you'd want more sophisticated cache management
-        cutoff_time = time.time() - (max_age_hours * 3600)
-        
-        # For now, just clear the entire cache periodically
-        if len(self.interaction_cache) > 1000:  # Arbitrary limit
-            self.interaction_cache.clear()
-            print("Interaction cache cleared due to size limit")
+        # 128 random bits as hex; IDs are only compared, so no UUID object is needed
+        return os.urandom(16).hex()
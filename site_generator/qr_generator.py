@@ -1,41 +1,105 @@
 import qrcode
+from qrcode.image.svg import SvgPathImage
 from io import BytesIO
 import base64
-from typing import Dict, Any
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Tuple
+
+try:
+    import png  # pypng writes the 1-bit module grid without Pillow's image pipeline
+    from qrcode.image.pure import PyPNGImage
+except ImportError:  # pypng is optional, fall back to Pillow for PNG
+    PyPNGImage = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    orjson = None
+
+def _payload_json(data: Dict[str, Any]) -> str:
+    """Key-sorted JSON, so equal payloads give the same QR (and cache key)"""
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS).decode()
+    return json.dumps(data, sort_keys=True)
+
+QR_CACHE_SIZE = 256  # encoded images kept by _render_qr_cached
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def _render_qr_cached(data: str, format: str, settings: Tuple[Tuple[str, Any], ...]) -> bytes:
+    """Build and encode a QR image; addresses repeat until the IP rotates"""
+    if format == 'SVG':
+        factory = SvgPathImage
+    elif format == 'PNG':
+        factory = PyPNGImage
+    else:
+        factory = None
+
+    qr = qrcode.QRCode(**dict(settings), image_factory=factory)
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    if factory is SvgPathImage:
+        # Bare <svg> element, ready to inline into a page
+        return qr.make_image().to_string()
+    if factory is not None:
+        img = qr.make_image()
+        img_buffer = BytesIO()
+        img.save(img_buffer)
+        return img_buffer.getvalue()
+
+    # Formats other than SVG and PNG (and PNG without pypng) go through Pillow
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    # Convert to bytes
+    img_buffer = BytesIO()
+    img.save(img_buffer, format=format)
+    return img_buffer.getvalue()
 
 class QRCodeGenerator:
+    QR_SETTINGS = {
+        'version': 1,
+        'error_correction': qrcode.constants.ERROR_CORRECT_L,
+        'box_size': 10,
+        'border': 4,
+    }
+
     def __init__(self):
-        self.qr_settings = {
-            'version': 1,
-            'error_correction': qrcode.constants.ERROR_CORRECT_L,
-            'box_size': 10,
-            'border': 4,
-        }
-    
+        self.qr_settings = dict(self.QR_SETTINGS)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='qr')
+
     def generate_qr_code(self, data: str, format: str = 'PNG') -> bytes:
-        """Generate QR code for given data"""
-        qr = qrcode.QRCode(**self.qr_settings)
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to bytes
-        img_buffer = BytesIO()
-        img.save(img_buffer, format=format)
-        return img_buffer.getvalue()
-    
-    def generate_address_qr(self, address_info: Dict[str, Any]) -> str:
-        """Generate QR code for site address and return as base64"""
-        qr_data = {
+        """Generate QR code for given data
+
+        'SVG' returns the markup of an inline <svg> element; other formats
+        return encoded image bytes.
+        """
+        # Settings are part of the key so a tweaked generator never gets stale images
+        return _render_qr_cached(data, format.upper(), tuple(sorted(self.qr_settings.items())))
+
+    def generate_qr_code_async(self, data: str, format: str = 'PNG') -> Future:
+        """Generate QR code on the background worker, returning a Future for the bytes"""
+        return self._executor.submit(self.generate_qr_code, data, format)
+
+    @staticmethod
+    def _address_payload(address_info: Dict[str, Any]) -> str:
+        """QR payload for a site address"""
+        return _payload_json({
             'url': address_info['url'],
             'type': 'social_site',
-            'timestamp': address_info['timestamp']
-        }
-        
-        qr_bytes = self.generate_qr_code(str(qr_data))
+            'timestamp': address_info.get('timestamp')
+        })
+
+    def generate_address_qr(self, address_info: Dict[str, Any]) -> str:
+        """Generate QR code for site address and return as base64"""
+        qr_bytes = self.generate_qr_code(self._address_payload(address_info))
         return base64.b64encode(qr_bytes).decode('utf-8')
-    
+
+    def generate_address_svg(self, address_info: Dict[str, Any]) -> str:
+        """Generate QR code for site address as inline SVG markup for HTML pages"""
+        return self.generate_qr_code(self._address_payload(address_info), 'SVG').decode('utf-8')
+
     def generate_contact_qr(self, user_info: Dict[str, Any]) -> str:
         """Generate QR code for user contact information"""
         contact_data = {
@@ -44,6 +108,6 @@ class QRCodeGenerator:
             'public_key': user_info.get('public_key'),
             'type': 'contact_card'
         }
-        
-        qr_bytes = self.generate_qr_code(str(contact_data))
+
+        qr_bytes = self.generate_qr_code(_payload_json(contact_data))
         return base64.b64encode(qr_bytes).decode('utf-8')
@@ -1,14 +1,30 @@
 import os
 import json
 from pathlib import Path
-from typing import Dict, Any, List
-from jinja2 import Environment, FileSystemLoader, Template
+from typing import Dict, Any, Iterator, List
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 
 class SiteTemplateEngine:
     def __init__(self, template_dir: str = "templates"):
         self.template_dir = Path(template_dir)
         self.template_dir.mkdir(exist_ok=True)
-        self.env = Environment(loader=FileSystemLoader(str(self.template_dir)))
+        # Compiled template code persists across restarts; buckets are keyed on the
+        # source checksum, so an edited template is recompiled on its next load.
+        # auto_reload stays on so a running engine picks up template edits; with
+        # the bytecode cache, the price is one stat per render rather than a recompile
+        cache_dir = self.template_dir / '.jinja_cache'
+        cache_dir.mkdir(exist_ok=True)
+        self.env = Environment(
+            loader=FileSystemLoader(str(self.template_dir)),
+            bytecode_cache=FileSystemBytecodeCache(str(cache_dir)),
+            auto_reload=True,
+            cache_size=400,
+            # .html output escapes interpolated values. The default templates only
+            # interpolate plain-text fields (names, bios, post and comment text),
+            # so this changes nothing but user-supplied markup, which is shown as
+            # text; a value that is meant to be HTML must come in as Markup
+            autoescape=select_autoescape(['html'])
+        )
         self._create_default_templates()
     
     def _create_default_templates(self):
@@ -75,8 +91,11 @@ class SiteTemplateEngine:
     
     def render_page(self, template_name: str, context: Dict[str, Any]) -> str:
         """Render a page with the given context"""
-        template = self.env.get_template(template_name)
-        return template.render(**context)
+        return self.env.get_template(template_name).render(**context)
+    
+    def render_page_stream(self, template_name: str, context: Dict[str, Any]) -> Iterator[str]:
+        """Render a page in chunks, without building the whole page as one string"""
+        return self.env.get_template(template_name).stream(**context)
     
     def generate_user_site(self, user_data: Dict[str, Any], posts: List[Dict[str, Any]]) -> str:
         """Generate the main user site HTML"""
@@ -85,3 +104,12 @@ class SiteTemplateEngine:
             'posts': posts
         }
         return self.render_page('index.html', context)
+    
+    def write_user_site(self, user_data: Dict[str, Any], posts: List[Dict[str, Any]],
+                        output_path: str):
+        """Stream the main user site HTML straight to a file"""
+        context = {
+            'user': user_data,
+            'posts': posts
+        }
+        self.render_page_stream('index.html', context).dump(str(output_path), encoding='utf-8')
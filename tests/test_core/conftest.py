@@ -0,0 +1,13 @@
+import pytest
+
+from core.encryption import EncryptionEngine
+
+@pytest.fixture(scope="session")
+def encryption_engine():
+    """Password-keyed engine; key derivation runs once per test session"""
+    return EncryptionEngine("test_password_123")
+
+@pytest.fixture(scope="session")
+def wrong_engine():
+    """Engine keyed from a different password, for decryption-failure tests"""
+    return EncryptionEngine("wrong_password")
@@ -1,124 +1,205 @@
-import unittest
+import pytest
 import tempfile
 import os
-from pathlib import Path
+import base64
 import sys
 
-# Add project root to path
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-
 from core.encryption import EncryptionEngine
 
-class TestEncryptionEngine(unittest.TestCase):
-    
-    def setUp(self):
-        """Set up test fixtures"""
-        self.password = "test_password_123"
-        self.encryption_engine = EncryptionEngine(self.password)
-        self.test_data = b"This is test data for encryption"
-        
-    def test_encryption_initialization_with_password(self):
-        """Test encryption engine initialization with password"""
-        engine = EncryptionEngine(self.password)
-        self.assertIsNotNone(engine.key)
-        self.assertIsNotNone(engine.cipher)
-        
-    def test_encryption_initialization_without_password(self):
-        """Test encryption engine initialization without password (random key)"""
-        engine = EncryptionEngine()
-        self.assertIsNotNone(engine.key)
-        self.assertIsNotNone(engine.cipher)
-        
-    def test_key_derivation_consistency(self):
-        """Test that key derivation produces consistent results"""
-        salt = b"test_salt_123456"
-        key1 = self.encryption_engine._derive_key(self.password, salt)
-        key2 = self.encryption_engine._derive_key(self.password, salt)
-        self.assertEqual(key1, key2)
-        
-    def test_key_derivation_different_passwords(self):
-        """Test that different passwords produce different keys"""
-        salt = b"test_salt_123456"
-        key1 = self.encryption_engine._derive_key("password1", salt)
-        key2 = self.encryption_engine._derive_key("password2", salt)
-        self.assertNotEqual(key1, key2)
-        
-    def test_encrypt_decrypt_data(self):
-        """Test basic encrypt/decrypt functionality"""
-        encrypted_data = self.encryption_engine.encrypt_data(self.test_data)
-        decrypted_data = self.encryption_engine.decrypt_data(encrypted_data)
-        
-        self.assertNotEqual(encrypted_data, self.test_data)
-        self.assertEqual(decrypted_data, self.test_data)
-        
-    def test_encrypt_decrypt_empty_data(self):
-        """Test encrypt/decrypt with empty data"""
-        empty_data = b""
-        encrypted_data = self.encryption_engine.encrypt_data(empty_data)
-        decrypted_data = self.encryption_engine.decrypt_data(encrypted_data)
-        
-        self.assertEqual(decrypted_data, empty_data)
-        
-    def test_encrypt_decrypt_large_data(self):
-        """Test encrypt/decrypt with large data"""
-        large_data = b"x" * 10000  # 10KB of data
-        encrypted_data = self.encryption_engine.encrypt_data(large_data)
-        decrypted_data = self.encryption_engine.decrypt_data(encrypted_data)
-        
-        self.assertEqual(decrypted_data, large_data)
-        
-    def test_encrypt_file(self):
-        """Test file encryption functionality"""
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as temp_file:
-            temp_file.write("This is test file content")
-            temp_file_path = temp_file.name
-            
-        try:
-            encrypted_file_path = self.encryption_engine.encrypt_file(temp_file_path)
-            
-            # Check that encrypted file exists
-            self.assertTrue(os.path.exists(encrypted_file_path))
-            self.assertTrue(encrypted_file_path.endswith('.encrypted'))
-            
-            # Read encrypted file and verify it's different from original
-            with open(temp_file_path, 'rb') as original:
-                original_content = original.read()
-                
-            with open(encrypted_file_path, 'rb') as encrypted:
-                encrypted_content = encrypted.read()
-                
-            self.assertNotEqual(original_content, encrypted_content)
-            
-            # Verify we can decrypt the content
-            decrypted_content = self.encryption_engine.decrypt_data(encrypted_content)
-            self.assertEqual(decrypted_content, original_content)
-            
-        finally:
-            # Clean up temp files
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-            if os.path.exists(encrypted_file_path):
-                os.unlink(encrypted_file_path)
-                
-    def test_decrypt_with_wrong_key(self):
-        """Test that decryption fails with wrong key"""
-        encrypted_data = self.encryption_engine.encrypt_data(self.test_data)
-        
-        # Create new engine with different password
-        wrong_engine = EncryptionEngine("wrong_password")
-        
-        with self.assertRaises(Exception):
-            wrong_engine.decrypt_data(encrypted_data)
-            
-    def test_decrypt_corrupted_data(self):
-        """Test that decryption fails with corrupted data"""
-        encrypted_data = self.encryption_engine.encrypt_data(self.test_data)
-        
-        # Corrupt the encrypted data
-        corrupted_data = b"corrupted" + encrypted_data[9:]
-        
-        with self.assertRaises(Exception):
-            self.encryption_engine.decrypt_data(corrupted_data)
+TEST_PASSWORD = "test_password_123"
+TEST_DATA = b"This is test data for encryption"
+
+def test_encryption_initialization_with_password():
+    """Test encryption engine initialization with password"""
+    engine = EncryptionEngine(TEST_PASSWORD)
+    assert engine.key is not None
+    assert engine.cipher is not None
+
+def test_encryption_initialization_without_password():
+    """Test encryption engine initialization without password (random key)"""
+    engine = EncryptionEngine()
+    assert engine.key is not None
+    assert engine.cipher is not None
+
+KDF_SALT = b"test_salt_123456"
+KDF_PASSWORDS = [TEST_PASSWORD, "password1", "password2"]
+
+@pytest.fixture(scope="module")
+def derived_keys(encryption_engine):
+    """Key for each of KDF_PASSWORDS with KDF_SALT, derived once per module"""
+    return {password: encryption_engine._derive_key(password, KDF_SALT)
+            for password in KDF_PASSWORDS}
+
+@pytest.fixture(params=KDF_PASSWORDS)
+def derived_key(request, derived_keys):
+    """(password, key) pair from derived_keys"""
+    return request.param, derived_keys[request.param]
+
+def test_key_derivation_consistency(encryption_engine, derived_key):
+    """Test that key derivation produces consistent results"""
+    password, key = derived_key
+    assert encryption_engine._derive_key(password, KDF_SALT) == key
+
+def test_key_derivation_different_passwords(derived_keys):
+    """Test that different passwords produce different keys"""
+    assert len(set(derived_keys.values())) == len(KDF_PASSWORDS)
+
+def test_load_or_derive_reuses_keyfile():
+    """Test that the keyfile salt reproduces the same key across engines"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        keyfile_path = os.path.join(temp_dir, 'keys', 'kdf.json')
+        engine1 = EncryptionEngine(TEST_PASSWORD, keyfile_path=keyfile_path)
+        assert os.path.exists(keyfile_path)
+
+        engine2 = EncryptionEngine(TEST_PASSWORD, keyfile_path=keyfile_path)
+        assert engine1.key == engine2.key
+
+        encrypted_data = engine1.encrypt_data(TEST_DATA)
+        assert engine2.decrypt_data(encrypted_data) == TEST_DATA
+
+        # The derived key itself is never persisted
+        with open(keyfile_path, 'rb') as f:
+            assert engine1.key not in f.read()
+
+def test_from_raw_key():
+    """Test building an engine from raw key bytes without key derivation"""
+    raw_key = bytes(range(32))
+    engine1 = EncryptionEngine.from_raw_key(raw_key)
+    engine2 = EncryptionEngine.from_raw_key(raw_key, fernet_compat=False)
+
+    encrypted_data = engine1.encrypt_data(TEST_DATA)
+    assert engine2.decrypt_data(encrypted_data) == TEST_DATA
+    assert engine2._fernet is None
+
+    with pytest.raises(ValueError):
+        EncryptionEngine.from_raw_key(b'short')
+
+# 64 AES blocks: enough for GCM's multi-block path, which encrypt_data uses for any size.
+# Chunked (framed) encryption is encrypt_file's, covered by the multiple-chunk test.
+LARGE_PAYLOAD = bytes(range(256)) * 4
+
+@pytest.mark.parametrize("payload", [b"", TEST_DATA, LARGE_PAYLOAD],
+                         ids=["empty", "small", "large"])
+def test_encrypt_decrypt_roundtrip(encryption_engine, payload):
+    """Test that encrypt/decrypt returns the original data"""
+    encrypted_data = encryption_engine.encrypt_data(payload)
+    assert encrypted_data != payload
+    assert encryption_engine.decrypt_data(encrypted_data) == payload
+
+def test_encrypt_file(encryption_engine):
+    """Test file encryption functionality"""
+    with tempfile.NamedTemporaryFile(mode='w', delete=False) as temp_file:
+        temp_file.write("This is test file content")
+        temp_file_path = temp_file.name
+
+    encrypted_file_path = temp_file_path + '.encrypted'
+    try:
+        encrypted_file_path = encryption_engine.encrypt_file(temp_file_path)
+
+        # Check that encrypted file exists
+        assert os.path.exists(encrypted_file_path)
+        assert encrypted_file_path.endswith('.encrypted')
+
+        # Read encrypted file and verify it's different from original
+        with open(temp_file_path, 'rb') as original:
+            original_content = original.read()
+
+        with open(encrypted_file_path, 'rb') as encrypted:
+            encrypted_content = encrypted.read()
+
+        assert original_content != encrypted_content
+
+        # Verify we can decrypt the content
+        decrypted_content = encryption_engine.decrypt_data(encrypted_content)
+        assert decrypted_content == original_content
+
+    finally:
+        # Clean up temp files
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+        if os.path.exists(encrypted_file_path):
+            os.unlink(encrypted_file_path)
+
+def test_encrypt_decrypt_file_multiple_chunks(encryption_engine):
+    """Test streamed file encryption across several chunks"""
+    from core.encryption import FILE_CHUNK_SIZE, NONCE_SIZE, TAG_SIZE
+    original_content = os.urandom(FILE_CHUNK_SIZE * 2 + FILE_CHUNK_SIZE // 2)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'media.bin')
+        with open(file_path, 'wb') as f:
+            f.write(original_content)
+
+        encrypted_file_path = encryption_engine.encrypt_file(file_path)
+        os.unlink(file_path)
+        assert encryption_engine.decrypt_file(encrypted_file_path) == file_path
+        with open(file_path, 'rb') as f:
+            assert f.read() == original_content
+
+        # Dropping the final frame must not yield a silently truncated file
+        frame_size = NONCE_SIZE + FILE_CHUNK_SIZE + TAG_SIZE
+        with open(encrypted_file_path, 'rb') as f:
+            frames = f.read()
+        truncated_path = os.path.join(temp_dir, 'truncated.encrypted')
+        with open(truncated_path, 'wb') as f:
+            f.write(frames[:frame_size * 2])
+        with pytest.raises(Exception):
+            encryption_engine.decrypt_file(truncated_path)
+        assert not os.path.exists(os.path.join(temp_dir, 'truncated'))
+
+def test_decrypt_with_wrong_key(encryption_engine, wrong_engine):
+    """Test that decryption fails with wrong key"""
+    encrypted_data = encryption_engine.encrypt_data(TEST_DATA)
+
+    with pytest.raises(Exception):
+        wrong_engine.decrypt_data(encrypted_data)
+
+def test_decrypt_corrupted_data(encryption_engine):
+    """Test that decryption fails with corrupted data"""
+    encrypted_data = encryption_engine.encrypt_data(TEST_DATA)
+
+    # Corrupt the encrypted data
+    corrupted_data = b"corrupted" + encrypted_data[9:]
+
+    with pytest.raises(Exception):
+        encryption_engine.decrypt_data(corrupted_data)
+
+def test_encrypted_data_is_raw_bytes(encryption_engine):
+    """Test that ciphertext is nonce + AES-GCM output without base64"""
+    encrypted_data = encryption_engine.encrypt_data(TEST_DATA)
+    # 12-byte nonce + ciphertext + 16-byte tag
+    assert len(encrypted_data) == 12 + len(TEST_DATA) + 16
+
+def test_decrypt_legacy_fernet_data(encryption_engine):
+    """Test that data written with the old Fernet format still decrypts"""
+    from cryptography.fernet import Fernet
+    legacy_token = Fernet(encryption_engine.key).encrypt(TEST_DATA)
+    assert encryption_engine.decrypt_data(legacy_token) == TEST_DATA
+    # Repeated reads reuse the keyed HMAC state without leaking between tokens
+    assert encryption_engine.decrypt_data(legacy_token) == TEST_DATA
+    tampered_token = Fernet(EncryptionEngine().key).encrypt(TEST_DATA)
+    with pytest.raises(Exception):
+        encryption_engine.decrypt_data(tampered_token)
+
+    strict_engine = EncryptionEngine(TEST_PASSWORD, fernet_compat=False)
+    with pytest.raises(Exception):
+        strict_engine.decrypt_data(legacy_token)
+
+def test_decrypt_legacy_fernet_file(encryption_engine, tmp_path):
+    """Test that a whole-file Fernet token from before chunked encryption still decrypts"""
+    from cryptography.fernet import Fernet
+    encrypted_file_path = tmp_path / 'legacy.bin.encrypted'
+    encrypted_file_path.write_bytes(Fernet(encryption_engine.key).encrypt(TEST_DATA))
+    output_path = tmp_path / 'legacy.bin'
+
+    strict_engine = EncryptionEngine.from_raw_key(
+        base64.urlsafe_b64decode(encryption_engine.key), fernet_compat=False)
+    with pytest.raises(Exception):
+        strict_engine.decrypt_file(str(encrypted_file_path))
+    assert not output_path.exists()
+
+    assert encryption_engine.decrypt_file(str(encrypted_file_path)) == str(output_path)
+    assert output_path.read_bytes() == TEST_DATA
 
 if __name__ == '__main__':
-    unittest.main()
+    sys.exit(pytest.main([__file__]))
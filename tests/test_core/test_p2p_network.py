@@ -1,208 +1,325 @@
-import unittest
+import pytest
 import threading
 import time
 import socket
-import json
-from pathlib import Path
 import sys
 
-# Add project root to path
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-
-from core.p2p_network import P2PNode
-
-class TestP2PNode(unittest.TestCase):
-    
-    def setUp(self):
-        """Set up test fixtures"""
-        # Use different ports for each test to avoid conflicts
-        self.test_port_1 = 19991
-        self.test_port_2 = 19992
-        self.node1 = P2PNode(self.test_port_1)
-        self.node2 = P2PNode(self.test_port_2)
-        
-        # Track messages received for testing
-        self.received_messages = []
-        self.message_lock = threading.Lock()
-        
-    def tearDown(self):
-        """Clean up test fixtures"""
-        self.node1.stop_node()
-        self.node2.stop_node()
-        time.sleep(0.1)  # Give nodes time to shutdown
-        
-    def test_node_initialization(self):
-        """Test P2P node initialization"""
-        self.assertEqual(self.node1.port, self.test_port_1)
-        self.assertEqual(self.node2.port, self.test_port_2)
-        self.assertFalse(self.node1.is_running)
-        self.assertFalse(self.node2.is_running)
-        self.assertEqual(len(self.node1.peer_connections), 0)
-        
-    def test_start_stop_node(self):
-        """Test starting and stopping nodes"""
+from core.p2p_network import P2PNode, FRAME_HEADER, FRAME_JSON, _encode_frame, msgpack
+
+# The shared pair listens on the first two ports; tests that start, stop or
+# add nodes of their own use the others
+NODE1_PORT = 19991
+NODE2_PORT = 19992
+EXTRA_NODE_PORT = 19994
+LIFECYCLE_PORT = 19995
+
+def _wait_until(predicate, timeout=2.0, interval=0.005):
+    """Poll predicate until it holds or timeout seconds pass; returns whether it held"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+def _disconnect_all(*nodes):
+    """Close every peer connection on the given nodes and wait for both ends to drop them"""
+    for node in nodes:
+        for _, writer in list(node.peer_connections.values()):
+            node._loop.call_soon_threadsafe(writer.close)
+    assert _wait_until(lambda: not any(node.peer_connections for node in nodes))
+
+class Inbox:
+    """Thread-safe record of the data delivered to a message handler"""
+
+    def __init__(self):
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def handler(self, peer_id, data):
+        with self.lock:
+            self.messages.append(data)
+
+@pytest.fixture(scope="module")
+def node_pair():
+    """Two started nodes shared by the module; binding and loop startup happen once"""
+    node1 = P2PNode(NODE1_PORT)
+    node2 = P2PNode(NODE2_PORT)
+    node1.start_node()
+    node2.start_node()
+    yield node1, node2
+    # stop_node joins the event loop thread, so the ports are free on return
+    node1.stop_node()
+    node2.stop_node()
+
+@pytest.fixture
+def nodes(node_pair):
+    """The shared node pair, reset to no handlers and no peers after each test"""
+    yield node_pair
+    for node in node_pair:
+        node.message_handlers.clear()
+    _disconnect_all(*node_pair)
+
+@pytest.fixture
+def inbox():
+    return Inbox()
+
+def test_node_initialization():
+    """Test P2P node initialization"""
+    node1 = P2PNode(NODE1_PORT)
+    node2 = P2PNode(NODE2_PORT)
+    assert node1.port == NODE1_PORT
+    assert node2.port == NODE2_PORT
+    assert not node1.is_running
+    assert not node2.is_running
+    assert len(node1.peer_connections) == 0
+
+def test_start_stop_node():
+    """Test starting and stopping nodes"""
+    node = P2PNode(LIFECYCLE_PORT)
+    try:
         # Start node
-        self.node1.start_node()
-        self.assertTrue(self.node1.is_running)
-        self.assertIsNotNone(self.node1.socket)
-        
+        node.start_node()
+        assert node.is_running
+        assert node.socket is not None
+    finally:
         # Stop node
-        self.node1.stop_node()
-        self.assertFalse(self.node1.is_running)
-        
-    def test_node_listening(self):
-        """Test that node can listen for connections"""
-        self.node1.start_node()
-        
-        # Try to connect to the node
-        test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            test_socket.connect(('localhost', self.test_port_1))
-            # If we get here, the node is listening
-            self.assertTrue(True)
-        except ConnectionRefusedError:
-            self.fail("Node is not listening on the expected port")
-        finally:
-            test_socket.close()
-            
-    def test_peer_connection(self):
-        """Test connecting two peers"""
-        # Start both nodes
-        self.node1.start_node()
-        self.node2.start_node()
-        time.sleep(0.1)  # Give nodes time to start
-        
-        # Connect node2 to node1
-        success = self.node2.connect_to_peer('localhost', self.test_port_1, 'peer1')
-        self.assertTrue(success)
-        
-        # Give connection time to establish
-        time.sleep(0.1)
-        
-        # Check that connection exists
-        self.assertIn('peer1', self.node2.peer_connections)
-        
-    def test_message_sending(self):
-        """Test sending messages between peers"""
-        # Set up message handler for node1
-        def handle_test_message(peer_id, data):
-            with self.message_lock:
-                self.received_messages.append({
-                    'peer_id': peer_id,
-                    'data': data
-                })
-        
-        self.node1.add_message_handler('test_message', handle_test_message)
-        
-        # Start both nodes and connect them
-        self.node1.start_node()
-        self.node2.start_node()
-        time.sleep(0.1)
-        
-        self.node2.connect_to_peer('localhost', self.test_port_1, 'peer1')
-        time.sleep(0.1)
-        
-        # Send message from node2 to node1
-        test_data = {'content': 'Hello from peer2', 'timestamp': time.time()}
-        success = self.node2.send_message('peer1', 'test_message', test_data)
-        self.assertTrue(success)
-        
-        # Give message time to be received and processed
-        time.sleep(0.1)
-        
-        # Check that message was received
-        with self.message_lock:
-            self.assertEqual(len(self.received_messages), 1)
-            received = self.received_messages[0]
-            self.assertEqual(received['data'], test_data)
-            
-    def test_message_broadcasting(self):
-        """Test broadcasting messages to multiple peers"""
-        # This test would require more complex setup with multiple peers
-        # For now, test that broadcast method exists and can be called
-        self.node1.start_node()
-        
-        test_data = {'broadcast': 'test message'}
-        # Should not raise an exception even with no peers
-        self.node1.broadcast_message('broadcast_test', test_data)
-        
-    def test_message_handler_registration(self):
-        """Test registering message handlers"""
-        def dummy_handler(peer_id, data):
-            pass
-            
-        # Register handler
-        self.node1.add_message_handler('test_type', dummy_handler)
-        
-        # Check that handler is registered
-        self.assertIn('test_type', self.node1.message_handlers)
-        self.assertEqual(self.node1.message_handlers['test_type'], dummy_handler)
-        
-    def test_send_message_to_nonexistent_peer(self):
-        """Test sending message to peer that doesn't exist"""
-        self.node1.start_node()
-        
-        # Try to send to non-existent peer
-        success = self.node1.send_message('nonexistent_peer', 'test', {'data': 'test'})
-        self.assertFalse(success)
-        
-    def test_multiple_message_types(self):
-        """Test handling multiple message types"""
-        message_counts = {'type1': 0, 'type2': 0}
-        
-        def handle_type1(peer_id, data):
-            message_counts['type1'] += 1
-            
-        def handle_type2(peer_id, data):
-            message_counts['type2'] += 1
-            
-        self.node1.add_message_handler('type1', handle_type1)
-        self.node1.add_message_handler('type2', handle_type2)
-        
-        # Start nodes and connect
-        self.node1.start_node()
-        self.node2.start_node()
-        time.sleep(0.1)
-        
-        self.node2.connect_to_peer('localhost', self.test_port_1, 'peer1')
-        time.sleep(0.1)
-        
-        # Send different types of messages
-        self.node2.send_message('peer1', 'type1', {'test': 1})
-        self.node2.send_message('peer1', 'type2', {'test': 2})
-        self.node2.send_message('peer1', 'type1', {'test': 3})
-        
-        time.sleep(0.2)  # Give messages time to be processed
-        
-        # Check that correct handlers were called
-        self.assertEqual(message_counts['type1'], 2)
-        self.assertEqual(message_counts['type2'], 1)
-        
-    def test_connection_cleanup_on_stop(self):
-        """Test that connections are cleaned up when node stops"""
-        self.node1.start_node()
-        self.node2.start_node()
-        time.sleep(0.1)
-        
+        node.stop_node()
+    assert not node.is_running
+
+def test_node_listening(nodes):
+    """Test that node can listen for connections"""
+    # Try to connect to the node
+    test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        test_socket.connect(('localhost', NODE1_PORT))
+    except ConnectionRefusedError:
+        pytest.fail("Node is not listening on the expected port")
+    finally:
+        test_socket.close()
+
+def test_accepts_several_connections(nodes):
+    """Test that simultaneous incoming connections are all accepted"""
+    node1, _ = nodes
+    clients = [socket.create_connection(('localhost', NODE1_PORT)) for _ in range(4)]
+    try:
+        assert _wait_until(lambda: len(node1.peer_connections) == 4)
+    finally:
+        for client in clients:
+            client.close()
+
+def test_peer_connection(nodes):
+    """Test connecting two peers"""
+    node1, node2 = nodes
+
+    # Connect node2 to node1
+    assert node2.connect_to_peer('localhost', NODE1_PORT, 'peer1')
+
+    # Check that connection exists on both ends
+    assert 'peer1' in node2.peer_connections
+    assert _wait_until(lambda: len(node1.peer_connections) == 1)
+
+def test_message_sending(nodes, inbox):
+    """Test sending messages between peers"""
+    node1, node2 = nodes
+    node1.add_message_handler('test_message', inbox.handler)
+    node2.connect_to_peer('localhost', NODE1_PORT, 'peer1')
+
+    # Send message from node2 to node1
+    test_data = {'content': 'Hello from peer2', 'timestamp': time.time()}
+    assert node2.send_message('peer1', 'test_message', test_data)
+
+    # Wait for the message to be received and processed
+    assert _wait_until(lambda: inbox.messages)
+    with inbox.lock:
+        assert inbox.messages == [test_data]
+
+def test_message_broadcasting(nodes):
+    """Test broadcasting messages to multiple peers"""
+    node1, _ = nodes
+    # Should not raise an exception even with no peers
+    node1.broadcast_message('broadcast_test', {'broadcast': 'test message'})
+
+def test_broadcast_reaches_every_peer(nodes, inbox):
+    """Test that one broadcast is delivered to each connected peer"""
+    node1, node2 = nodes
+    node3 = P2PNode(EXTRA_NODE_PORT)
+    node2.add_message_handler('announce', inbox.handler)
+    node3.add_message_handler('announce', inbox.handler)
+
+    try:
+        node3.start_node()
+        node2.connect_to_peer('localhost', NODE1_PORT, 'peer1')
+        node3.connect_to_peer('localhost', NODE1_PORT, 'peer1')
+        assert _wait_until(lambda: len(node1.peer_connections) == 2)
+
+        node1.broadcast_message('announce', {'seq': 1})
+        assert _wait_until(lambda: len(inbox.messages) == 2)
+    finally:
+        node3.stop_node()
+
+    with inbox.lock:
+        assert inbox.messages == [{'seq': 1}, {'seq': 1}]
+
+def test_message_handler_registration(nodes):
+    """Test registering message handlers"""
+    node1, _ = nodes
+
+    def dummy_handler(peer_id, data):
+        pass
+
+    # Register handler
+    node1.add_message_handler('test_type', dummy_handler)
+
+    # Check that handler is registered
+    assert node1.message_handlers['test_type'] is dummy_handler
+
+def test_send_message_to_nonexistent_peer(nodes):
+    """Test sending message to peer that doesn't exist"""
+    node1, _ = nodes
+    assert not node1.send_message('nonexistent_peer', 'test', {'data': 'test'})
+
+def test_multiple_message_types(nodes):
+    """Test handling multiple message types"""
+    node1, node2 = nodes
+    message_counts = {'type1': 0, 'type2': 0}
+
+    def handle_type1(peer_id, data):
+        message_counts['type1'] += 1
+
+    def handle_type2(peer_id, data):
+        message_counts['type2'] += 1
+
+    node1.add_message_handler('type1', handle_type1)
+    node1.add_message_handler('type2', handle_type2)
+    node2.connect_to_peer('localhost', NODE1_PORT, 'peer1')
+
+    # Send different types of messages
+    node2.send_message('peer1', 'type1', {'test': 1})
+    node2.send_message('peer1', 'type2', {'test': 2})
+    node2.send_message('peer1', 'type1', {'test': 3})
+
+    # Wait for the messages to be processed, then check the right handlers ran
+    assert _wait_until(lambda: sum(message_counts.values()) == 3)
+    assert message_counts == {'type1': 2, 'type2': 1}
+
+def test_handler_can_reply(nodes, inbox):
+    """Test that a message handler can send a reply from the event loop"""
+    node1, node2 = nodes
+
+    def handle_ping(peer_id, data):
+        node1.send_message(peer_id, 'pong', data)
+
+    node1.add_message_handler('ping', handle_ping)
+    node2.add_message_handler('pong', inbox.handler)
+
+    node2.connect_to_peer('localhost', NODE1_PORT, 'peer1')
+    node2.send_message('peer1', 'ping', {'seq': 1})
+
+    assert _wait_until(lambda: inbox.messages)
+    with inbox.lock:
+        assert inbox.messages == [{'seq': 1}]
+
+def test_handler_can_connect_to_peer(nodes):
+    """Test that connect_to_peer from a message handler does not block the event loop"""
+    node1, node2 = nodes
+
+    def handle_introduce(peer_id, data):
+        node1.connect_to_peer('localhost', NODE2_PORT, 'peer2')
+
+    node1.add_message_handler('introduce', handle_introduce)
+    node2.connect_to_peer('localhost', NODE1_PORT, 'peer1')
+    node2.send_message('peer1', 'introduce', {})
+
+    assert _wait_until(lambda: 'peer2' in node1.peer_connections)
+    # The loop is still free to serve calls from other threads
+    node1.broadcast_message('after_connect', {})
+    assert node1.send_message('peer2', 'after_connect', {})
+
+def test_handler_can_stop_node(nodes):
+    """Test that stop_node from a message handler shuts the node down"""
+    _, node2 = nodes
+    node = P2PNode(LIFECYCLE_PORT)
+
+    def handle_shutdown(peer_id, data):
+        node.stop_node()
+
+    node.add_message_handler('shutdown', handle_shutdown)
+    try:
+        node.start_node()
+        node2.connect_to_peer('localhost', LIFECYCLE_PORT, 'lifecycle')
+        node2.send_message('lifecycle', 'shutdown', {})
+        assert _wait_until(lambda: node._loop is None)
+        assert not node.is_running
+    finally:
+        node.stop_node()
+
+def test_fragmented_and_batched_frames(nodes, inbox):
+    """Test that frames split across reads and several frames per read are delivered"""
+    node1, _ = nodes
+    node1.add_message_handler('test_message', inbox.handler)
+
+    frames = b''.join(
+        _encode_frame({'type': 'test_message', 'data': {'seq': i}})
+        for i in range(3)
+    )
+    # A corrupt body is skipped without losing the frames after it
+    frames += FRAME_HEADER.pack(FRAME_JSON, 8) + b'not json'
+    # So are unhandled and malformed message types
+    frames += _encode_frame({'type': 'unhandled', 'data': {}})
+    frames += _encode_frame({'type': ['not', 'hashable'], 'data': {}})
+    frames += _encode_frame({'type': 'test_message', 'data': {'seq': 3}})
+
+    raw_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        raw_socket.connect(('localhost', NODE1_PORT))
+        raw_socket.sendall(frames[:10])
+        time.sleep(0.05)
+        raw_socket.sendall(frames[10:])
+        assert _wait_until(lambda: len(inbox.messages) == 4)
+    finally:
+        raw_socket.close()
+
+    with inbox.lock:
+        assert inbox.messages == [{'seq': 0}, {'seq': 1}, {'seq': 2}, {'seq': 3}]
+
+@pytest.mark.skipif(not msgpack, reason="msgpack not installed")
+def test_binary_payload(nodes, inbox):
+    """Test that bytes survive the msgpack wire format without base64"""
+    node1, node2 = nodes
+    node1.add_message_handler('blob', inbox.handler)
+
+    node2.connect_to_peer('localhost', NODE1_PORT, 'peer1')
+    node2.send_message('peer1', 'blob', {'chunk': b'\x00\xff\n'})
+    assert _wait_until(lambda: inbox.messages)
+
+    with inbox.lock:
+        assert inbox.messages == [{'chunk': b'\x00\xff\n'}]
+
+def test_connection_cleanup_on_stop(nodes):
+    """Test that connections are cleaned up when node stops"""
+    node = P2PNode(LIFECYCLE_PORT)
+    try:
+        node.start_node()
+
         # Establish connection
-        self.node2.connect_to_peer('localhost', self.test_port_1, 'peer1')
-        time.sleep(0.1)
-        
+        node.connect_to_peer('localhost', NODE1_PORT, 'peer1')
+
         # Verify connection exists
-        self.assertTrue(len(self.node2.peer_connections) > 0)
-        
+        assert len(node.peer_connections) > 0
+    finally:
         # Stop node
-        self.node2.stop_node()
-        
-        # Verify connections are cleaned up
-        self.assertEqual(len(self.node2.peer_connections), 0)
-        
-    def test_invalid_json_handling(self):
-        """Test handling of invalid JSON messages"""
-        # This is more of an integration test - would need actual socket
-        # communication to test invalid JSON handling properly
-        # For now, just verify the method exists
-        self.assertTrue(hasattr(self.node1, '_handle_peer_messages'))
+        node.stop_node()
+
+    # Verify connections are cleaned up
+    assert len(node.peer_connections) == 0
+
+def test_invalid_json_handling(nodes):
+    """Test handling of invalid JSON messages"""
+    # Exercised end to end by test_fragmented_and_batched_frames; here just
+    # verify the method exists
+    node1, _ = nodes
+    assert hasattr(node1, '_handle_peer_messages')
 
 if __name__ == '__main__':
-    unittest.main()
+    sys.exit(pytest.main([__file__]))
@@ -1,174 +1,170 @@
-import unittest
-import tempfile
-import shutil
+import pytest
 import os
-from pathlib import Path
+import json
 import sys
 
-# Add project root to path
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-
 from core.storage import SandboxedStorage
 from core.encryption import EncryptionEngine
 
-class TestSandboxedStorage(unittest.TestCase):
-    
-    def setUp(self):
-        """Set up test fixtures"""
-        self.temp_dir = tempfile.mkdtemp()
-        self.encryption_engine = EncryptionEngine("test_password")
-        self.storage = SandboxedStorage(self.temp_dir, self.encryption_engine)
-        
-        self.test_data = {
-            "user_id": "test_user_123",
-            "name": "Test User",
-            "posts": ["post1", "post2"],
-            "metadata": {"created": 1234567890}
-        }
-        
-    def tearDown(self):
-        """Clean up test fixtures"""
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-            
-    def test_sandbox_structure_creation(self):
-        """Test that sandbox directory structure is created properly"""
-        expected_dirs = [
-            'user_data', 'media', 'posts', 'connections',
-            'temp', 'cache', 'backups', 'keys'
-        ]
-        
-        for directory in expected_dirs:
-            dir_path = Path(self.temp_dir) / directory
-            self.assertTrue(dir_path.exists())
-            self.assertTrue(dir_path.is_dir())
-            
-    def test_store_and_retrieve_encrypted_data(self):
-        """Test storing and retrieving encrypted data"""
-        category = "user_data"
-        filename = "test_profile"
-        
-        # Store data
-        file_path = self.storage.store_encrypted_data(category, filename, self.test_data)
-        self.assertTrue(os.path.exists(file_path))
-        self.assertTrue(file_path.endswith('.enc'))
-        
-        # Retrieve data
-        retrieved_data = self.storage.retrieve_encrypted_data(category, filename)
-        self.assertEqual(retrieved_data, self.test_data)
-        
-    def test_store_retrieve_multiple_files(self):
-        """Test storing and retrieving multiple files"""
-        test_files = {
-            ("posts", "post1"): {"content": "First post", "timestamp": 1234567890},
-            ("posts", "post2"): {"content": "Second post", "timestamp": 1234567891},
-            ("connections", "friend1"): {"user_id": "friend1", "status": "accepted"}
-        }
-        
-        # Store all files
-        for (category, filename), data in test_files.items():
-            self.storage.store_encrypted_data(category, filename, data)
-            
-        # Retrieve and verify all files
-        for (category, filename), expected_data in test_files.items():
-            retrieved_data = self.storage.retrieve_encrypted_data(category, filename)
-            self.assertEqual(retrieved_data, expected_data)
-            
-    def test_retrieve_nonexistent_file(self):
-        """Test retrieving a file that doesn't exist"""
-        with self.assertRaises(FileNotFoundError):
-            self.storage.retrieve_encrypted_data("user_data", "nonexistent")
-            
-    def test_get_sandbox_path(self):
-        """Test getting sandbox paths"""
-        # Test root path
-        root_path = self.storage.get_sandbox_path()
-        self.assertEqual(str(root_path), self.temp_dir)
-        
-        # Test category path
-        posts_path = self.storage.get_sandbox_path("posts")
-        expected_path = Path(self.temp_dir) / "posts"
-        self.assertEqual(posts_path, expected_path)
-        
-    def test_data_encryption_integrity(self):
-        """Test that stored data is actually encrypted"""
-        category = "user_data"
-        filename = "test_encryption"
-        
-        # Store data
-        file_path = self.storage.store_encrypted_data(category, filename, self.test_data)
-        
-        # Read raw file content
-        with open(file_path, 'rb') as f:
-            raw_content = f.read()
-            
-        # Verify that raw content is not the same as original JSON
-        import json
-        original_json = json.dumps(self.test_data).encode()
-        self.assertNotEqual(raw_content, original_json)
-        
-        # Verify that raw content doesn't contain readable user data
-        raw_content_str = raw_content.decode('utf-8', errors='ignore')
-        self.assertNotIn("Test User", raw_content_str)
-        self.assertNotIn("test_user_123", raw_content_str)
-        
-    def test_storage_with_different_encryption_keys(self):
-        """Test that data encrypted with one key cannot be read with another"""
-        category = "user_data"
-        filename = "test_key_isolation"
-        
-        # Store data with first storage instance
-        self.storage.store_encrypted_data(category, filename, self.test_data)
-        
-        # Create new storage with different encryption key
-        different_encryption = EncryptionEngine("different_password")
-        different_storage = SandboxedStorage(self.temp_dir, different_encryption)
-        
-        # Try to retrieve data with different key - should fail
-        with self.assertRaises(Exception):
-            different_storage.retrieve_encrypted_data(category, filename)
-            
-    def test_store_empty_data(self):
-        """Test storing and retrieving empty data"""
-        empty_data = {}
-        category = "temp"
-        filename = "empty_test"
-        
-        self.storage.store_encrypted_data(category, filename, empty_data)
-        retrieved_data = self.storage.retrieve_encrypted_data(category, filename)
-        
-        self.assertEqual(retrieved_data, empty_data)
-        
-    def test_store_complex_nested_data(self):
-        """Test storing and retrieving complex nested data structures"""
-        complex_data = {
-            "user": {
-                "profile": {
-                    "name": "Complex User",
-                    "settings": {
-                        "privacy": {"posts": "friends", "profile": "public"},
-                        "notifications": {"email": True, "push": False}
-                    }
-                },
-                "posts": [
-                    {"id": 1, "content": "First post", "likes": [1, 2, 3]},
-                    {"id": 2, "content": "Second post", "likes": []}
-                ]
-            },
-            "metadata": {
-                "version": 1.0,
-                "created": 1234567890,
-                "features": ["encryption", "p2p", "local-first"]
+TEST_DATA = {
+    "user_id": "test_user_123",
+    "name": "Test User",
+    "posts": ["post1", "post2"],
+    "metadata": {"created": 1234567890}
+}
+
+COMPLEX_DATA = {
+    "user": {
+        "profile": {
+            "name": "Complex User",
+            "settings": {
+                "privacy": {"posts": "friends", "profile": "public"},
+                "notifications": {"email": True, "push": False}
             }
-        }
-        
-        category = "user_data"
-        filename = "complex_profile"
-        
-        self.storage.store_encrypted_data(category, filename, complex_data)
-        retrieved_data = self.storage.retrieve_encrypted_data(category, filename)
-        
-        self.assertEqual(retrieved_data, complex_data)
+        },
+        "posts": [
+            {"id": 1, "content": "First post", "likes": [1, 2, 3]},
+            {"id": 2, "content": "Second post", "likes": []}
+        ]
+    },
+    "metadata": {
+        "version": 1.0,
+        "created": 1234567890,
+        "features": ["encryption", "p2p", "local-first"]
+    }
+}
+
+@pytest.fixture(scope="module")
+def storage(tmp_path_factory, encryption_engine):
+    """Sandbox shared by the module; the directory tree is laid out once"""
+    sandbox_dir = tmp_path_factory.mktemp("sandbox")
+    return SandboxedStorage(str(sandbox_dir), encryption_engine)
+
+@pytest.fixture(autouse=True)
+def _remove_stored_files(request, monkeypatch):
+    """Delete the files a test stores in the shared sandbox once it finishes"""
+    if 'storage' not in request.fixturenames:
+        yield
+        return
+
+    storage = request.getfixturevalue('storage')
+    stored_paths = []
+    store_encrypted_data = storage.store_encrypted_data
+
+    def recording_store(category, filename, data):
+        file_path = store_encrypted_data(category, filename, data)
+        stored_paths.append(file_path)
+        return file_path
+
+    monkeypatch.setattr(storage, 'store_encrypted_data', recording_store)
+    yield
+    for file_path in stored_paths:
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+
+@pytest.fixture
+def isolated_storage(tmp_path, encryption_engine):
+    """Sandbox of its own, for tests that open the same directory with another key"""
+    return SandboxedStorage(str(tmp_path), encryption_engine)
+
+def test_sandbox_structure_creation(storage):
+    """Test that sandbox directory structure is created properly"""
+    expected_dirs = [
+        'user_data', 'media', 'posts', 'connections',
+        'temp', 'cache', 'backups', 'keys'
+    ]
+
+    for directory in expected_dirs:
+        dir_path = storage.base_path / directory
+        assert dir_path.exists()
+        assert dir_path.is_dir()
+
+@pytest.mark.parametrize("category, filename, data", [
+    ("temp", "empty_test", {}),
+    ("user_data", "test_profile", TEST_DATA),
+    ("user_data", "complex_profile", COMPLEX_DATA),
+], ids=["empty", "simple", "complex"])
+def test_store_and_retrieve_roundtrip(storage, category, filename, data):
+    """Test storing and retrieving encrypted data"""
+    file_path = storage.store_encrypted_data(category, filename, data)
+    assert os.path.exists(file_path)
+    assert file_path.endswith('.enc')
+
+    assert storage.retrieve_encrypted_data(category, filename) == data
+
+def test_store_retrieve_multiple_files(storage):
+    """Test storing and retrieving multiple files"""
+    test_files = {
+        ("posts", "post1"): {"content": "First post", "timestamp": 1234567890},
+        ("posts", "post2"): {"content": "Second post", "timestamp": 1234567891},
+        ("connections", "friend1"): {"user_id": "friend1", "status": "accepted"}
+    }
+
+    # Store all files
+    for (category, filename), data in test_files.items():
+        storage.store_encrypted_data(category, filename, data)
+
+    # Retrieve and verify all files
+    for (category, filename), expected_data in test_files.items():
+        assert storage.retrieve_encrypted_data(category, filename) == expected_data
+
+def test_retrieve_nonexistent_file(storage):
+    """Test retrieving a file that doesn't exist"""
+    with pytest.raises(FileNotFoundError):
+        storage.retrieve_encrypted_data("user_data", "nonexistent")
+
+def test_stored_files_do_not_leak_between_tests(storage):
+    """Test that files stored by earlier tests were removed from the shared sandbox"""
+    with pytest.raises(FileNotFoundError):
+        storage.retrieve_encrypted_data("user_data", "test_profile")
+
+def test_get_sandbox_path(storage):
+    """Test getting sandbox paths"""
+    # Test root path
+    assert storage.get_sandbox_path() == storage.base_path
+
+    # Test category path
+    assert storage.get_sandbox_path("posts") == storage.base_path / "posts"
+
+def test_get_sandbox_str(storage):
+    """Test that string sandbox paths match get_sandbox_path and are memoized"""
+    assert storage.get_sandbox_str() == str(storage.base_path)
+    posts_path = storage.get_sandbox_str("posts")
+    assert posts_path == str(storage.get_sandbox_path("posts"))
+    assert storage.get_sandbox_str("posts") is posts_path
+
+def test_data_encryption_integrity(storage):
+    """Test that stored data is actually encrypted"""
+    # Store data
+    file_path = storage.store_encrypted_data("user_data", "test_encryption", TEST_DATA)
+
+    # Read raw file content
+    with open(file_path, 'rb') as f:
+        raw_content = f.read()
+
+    # Verify that raw content is not the same as original JSON
+    assert raw_content != json.dumps(TEST_DATA).encode()
+
+    # Verify that raw content doesn't contain readable user data
+    raw_content_str = raw_content.decode('utf-8', errors='ignore')
+    assert "Test User" not in raw_content_str
+    assert "test_user_123" not in raw_content_str
+
+def test_storage_with_different_encryption_keys(isolated_storage):
+    """Test that data encrypted with one key cannot be read with another"""
+    category = "user_data"
+    filename = "test_key_isolation"
+
+    # Store data with first storage instance
+    isolated_storage.store_encrypted_data(category, filename, TEST_DATA)
+
+    # Create new storage with different encryption key
+    different_encryption = EncryptionEngine("different_password")
+    different_storage = SandboxedStorage(str(isolated_storage.base_path), different_encryption)
+
+    # Try to retrieve data with different key - should fail
+    with pytest.raises(Exception):
+        different_storage.retrieve_encrypted_data(category, filename)
 
 if __name__ == '__main__':
-    unittest.main()
+    sys.exit(pytest.main([__file__]))
@@ -195,7 +195,42 @@ class TestLocalWebServer(unittest.TestCase):
             
         except requests.exceptions.RequestException as e:
             self.fail(f"Static file request failed: {e}")
-            
+
+    def test_gzip_sidecar_and_large_file_serving(self):
+        """Test precompressed sidecars and sendfile-backed large files"""
+        import gzip
+
+        css_content = b"body { color: red; }"
+        with open(os.path.join(self.temp_dir, 'app.css'), 'wb') as f:
+            f.write(css_content)
+        with open(os.path.join(self.temp_dir, 'app.css.gz'), 'wb') as f:
+            f.write(gzip.compress(css_content))
+
+        large_content = os.urandom(512 * 1024)
+        with open(os.path.join(self.temp_dir, 'large.bin'), 'wb') as f:
+            f.write(large_content)
+
+        self.server.start_server()
+        time.sleep(0.1)
+
+        try:
+            response = requests.get(f'http://localhost:{self.test_port}/app.css',
+                                    headers={'Accept-Encoding': 'gzip'}, timeout=1)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+            self.assertEqual(response.content, css_content)
+
+            response = requests.get(f'http://localhost:{self.test_port}/app.css',
+                                    headers={'Accept-Encoding': 'identity'}, timeout=1)
+            self.assertIsNone(response.headers.get('Content-Encoding'))
+            self.assertEqual(response.content, css_content)
+
+            response = requests.get(f'http://localhost:{self.test_port}/large.bin', timeout=5)
+            self.assertEqual(response.content, large_content)
+
+        except requests.exceptions.RequestException as e:
+            self.fail(f"Static file request failed: {e}")
+
     def test_multiple_route_handlers(self):
         """Test multiple route handlers"""
         def handler1(request):
@@ -225,6 +260,34 @@ class TestLocalWebServer(unittest.TestCase):
         except requests.exceptions.RequestException as e:
             self.fail(f"Multiple handler request failed: {e}")
             
+    def test_route_handlers_run_one_at_a_time(self):
+        """Test that concurrent requests never run route handlers in parallel"""
+        import threading
+        active = []
+        overlaps = []
+
+        def slow_handler(request):
+            active.append(request.path)
+            if len(active) > 1:
+                overlaps.append(list(active))
+            time.sleep(0.05)
+            active.remove(request.path)
+            return {'status': 'ok'}
+
+        self.server.add_route_handler('/api/slow', slow_handler)
+        self.server.start_server()
+        time.sleep(0.1)
+
+        url = f'http://localhost:{self.test_port}/api/slow'
+        clients = [threading.Thread(target=requests.get, args=(url,), kwargs={'timeout': 2})
+                   for _ in range(4)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+
+        self.assertEqual(overlaps, [])
+
     def test_handler_exception_handling(self):
         """Test that handler exceptions don't crash the server"""
         def failing_handler(request):
@@ -0,0 +1,196 @@
+import unittest
+import tempfile
+import shutil
+import os
+import json
+import sqlite3
+from unittest.mock import patch
+from pathlib import Path
+import sys
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from database.local_db import LocalDatabase
+
+class TestLocalDatabase(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = LocalDatabase(os.path.join(self.temp_dir, 'test.db'))
+        self.user_id = self.db.create_user("Test User", bio="Testing")
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.db.close()
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_update_user(self):
+        """Test that updates apply regardless of keyword order"""
+        self.assertTrue(self.db.update_user(self.user_id, preferences={'theme': 'dark'}, name="Renamed"))
+        self.assertTrue(self.db.update_user(self.user_id, bio="New bio", name="Renamed again"))
+
+        user = self.db.get_user(self.user_id)
+        self.assertEqual(user.name, "Renamed again")
+        self.assertEqual(user.bio, "New bio")
+        self.assertEqual(user.preferences, {'theme': 'dark'})
+        self.assertFalse(self.db.update_user("missing", name="Nobody"))
+
+    def test_create_and_get_post(self):
+        """Test single post round-trip including JSON columns"""
+        post_id = self.db.create_post(self.user_id, "Hello", media_urls=["a.png"],
+                                      metadata={"tags": ["x"]})
+        post = self.db.get_post(post_id)
+
+        self.assertEqual(post.content, "Hello")
+        self.assertEqual(post.media_urls, ["a.png"])
+        self.assertEqual(post.metadata, {"tags": ["x"]})
+
+    def test_create_posts_bulk(self):
+        """Test creating many posts in one call"""
+        records = [
+            {'user_id': self.user_id, 'content': f"Post {i}"}
+            for i in range(5)
+        ]
+        records.append({'user_id': self.user_id, 'content': "Secret", 'privacy_level': 'private'})
+
+        post_ids = self.db.create_posts_bulk(records)
+
+        self.assertEqual(len(post_ids), 6)
+        self.assertEqual(len(set(post_ids)), 6)
+        self.assertEqual(len(self.db.get_user_posts(self.user_id)), 6)
+        self.assertEqual(len(self.db.get_public_posts()), 5)
+        self.assertEqual(self.db.get_post(post_ids[0]).media_urls, [])
+
+    def test_get_public_posts_json(self):
+        """Test that the JSON feed matches the hydrated public posts"""
+        self.db.create_post(self.user_id, "Public", media_urls=["a.png"], metadata={"k": 1})
+        self.db.create_post(self.user_id, "Private", privacy_level='private')
+
+        feed = json.loads(self.db.get_public_posts_json())
+        posts = self.db.get_public_posts()
+
+        self.assertEqual(len(feed), 1)
+        self.assertEqual(feed[0]['post_id'], posts[0].post_id)
+        self.assertEqual(feed[0]['content'], "Public")
+        self.assertEqual(feed[0]['media_urls'], ["a.png"])
+        self.assertEqual(feed[0]['metadata'], {"k": 1})
+
+    def test_feed_queries_use_indexes(self):
+        """Test that feed and connection queries avoid table scans and sorts"""
+        plans = {
+            'idx_posts_public_recent': """
+                SELECT * FROM posts WHERE privacy_level = 'public'
+                ORDER BY created_at DESC LIMIT 50 OFFSET 0
+            """,
+            'idx_conn_user_status': """
+                SELECT * FROM connections WHERE user_id = 'u' AND connection_status = 'accepted'
+                ORDER BY created_at DESC
+            """
+        }
+        for index_name, query in plans.items():
+            plan = ' '.join(row[3] for row in self.db.connection.execute('EXPLAIN QUERY PLAN ' + query))
+            self.assertIn(index_name, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_create_posts_bulk_rolls_back_on_error(self):
+        """Test that a failing record leaves no partial batch behind"""
+        records = [
+            {'user_id': self.user_id, 'content': "Valid"},
+            {'user_id': self.user_id, 'content': None},  # violates NOT NULL
+        ]
+
+        with self.assertRaises(Exception):
+            self.db.create_posts_bulk(records)
+
+        self.assertEqual(self.db.get_user_posts(self.user_id), [])
+
+    def test_create_comments_and_connections_bulk(self):
+        """Test bulk comment and connection creation"""
+        post_id = self.db.create_post(self.user_id, "Hello")
+
+        comment_ids = self.db.create_comments_bulk([
+            {'post_id': post_id, 'author_id': self.user_id, 'content': "First"},
+            {'post_id': post_id, 'author_id': self.user_id, 'content': "Second"},
+        ])
+        connection_ids = self.db.create_connections_bulk([
+            {'user_id': self.user_id, 'peer_user_id': 'peer_1'},
+            {'user_id': self.user_id, 'peer_user_id': 'peer_2',
+             'permissions': {'view': True, 'comment': False, 'share': False}},
+        ])
+
+        comments = self.db.get_post_comments(post_id)
+        self.assertEqual([c.comment_id for c in comments], comment_ids)
+
+        connections = self.db.get_user_connections(self.user_id)
+        self.assertEqual({c.connection_id for c in connections}, set(connection_ids))
+        self.assertTrue(all(c.connection_status == 'pending' for c in connections))
+
+    def test_store_media_files_bulk(self):
+        """Test bulk media file registration"""
+        file_ids = self.db.store_media_files_bulk([
+            {'user_id': self.user_id, 'filename': 'a.png', 'file_path': '/media/a.png',
+             'file_type': 'image/png', 'file_size': 10},
+            {'user_id': self.user_id, 'filename': 'b.mp4', 'file_path': '/media/b.mp4',
+             'file_type': 'video/mp4', 'file_size': 20, 'metadata': {'length': 3}},
+        ])
+
+        media_file = self.db.get_media_file(file_ids[1])
+        self.assertEqual(media_file.filename, 'b.mp4')
+        self.assertEqual(media_file.metadata, {'length': 3})
+        self.assertTrue(media_file.is_encrypted)
+
+    def test_maintenance_tick_reclaims_pages(self):
+        """Test that incremental vacuum returns freed pages and ANALYZE runs"""
+        self.assertEqual(self.db.connection.execute('PRAGMA auto_vacuum').fetchone()[0], 2)
+
+        post_ids = self.db.create_posts_bulk(
+            {'user_id': self.user_id, 'content': 'x' * 2000} for _ in range(200)
+        )
+        for post_id in post_ids:
+            self.db.delete_post(post_id, self.user_id)
+        freelist_count = lambda: self.db.connection.execute('PRAGMA freelist_count').fetchone()[0]
+        self.assertGreater(freelist_count(), 0)
+
+        self.db.maintenance_tick()
+
+        self.assertEqual(freelist_count(), 0)
+        self.assertTrue(self.db.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone())
+
+    def test_maintenance_tick_leaves_shared_transaction_open(self):
+        """Test that maintenance never commits a write in progress on the shared connection"""
+        self.db.connection.execute(self.db.INSERT_USER_SQL, (
+            'pending', 'Pending', '', '', '', 0.0, 0.0, '{}'))
+        self.assertTrue(self.db.connection.in_transaction)
+
+        # The open write holds SQLite's lock, so maintenance waits and gives up
+        with patch.object(self.db, 'MAINTENANCE_BUSY_TIMEOUT', 0.05):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.db.maintenance_tick()
+
+        self.assertTrue(self.db.connection.in_transaction)
+        self.db.connection.rollback()
+        self.assertIsNone(self.db.get_user('pending'))
+
+    def test_cursor_reused_per_thread(self):
+        """Test that each thread gets and keeps its own cursor"""
+        import threading
+        cursor = self.db._cursor()
+        self.assertIs(self.db._cursor(), cursor)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.db._cursor()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], cursor)
+
+        # Reads through the shared cursor still return complete results
+        self.db.create_post(self.user_id, "Hello")
+        self.assertEqual(len(self.db.get_user_posts(self.user_id)), 1)
+        self.assertEqual(self.db.get_user(self.user_id).name, "Test User")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,337 @@
+import unittest
+import tempfile
+import shutil
+import sqlite3
+import os
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from database.local_db import LocalDatabase
+from database.migrations import DatabaseMigrator, run_migrations, _execute_script
+
+class TestDatabaseMigrator(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test.db')
+        LocalDatabase(self.db_path).close()
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_run_migrations_to_latest(self):
+        """Test migrating a fresh database to the latest version"""
+        with self.assertLogs('database.migrations', 'INFO') as logs:
+            self.assertTrue(run_migrations(self.db_path))
+        self.assertIn('Applying migration 4: add_post_reactions', '\n'.join(logs.output))
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrator = DatabaseMigrator(conn)
+            status = migrator.status()
+            self.assertEqual(status['current_version'], status['latest_version'])
+            self.assertEqual(status['pending_count'], 0)
+            self.assertEqual([m['version'] for m in status['applied_migrations']], [1, 2, 3, 4, 5])
+            self.assertEqual(set(status['applied_migrations'][0]),
+                             {'version', 'name', 'applied_at', 'checksum'})
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            reactions_sql = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'post_reactions'").fetchone()[0]
+            self.assertIn('WITHOUT ROWID', reactions_sql)
+            self.assertTrue(conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone())
+
+            plan = ' '.join(row[3] for row in conn.execute('''
+                EXPLAIN QUERY PLAN
+                SELECT reaction_type, COUNT(*) FROM post_reactions
+                WHERE post_id = 'p' GROUP BY reaction_type
+            '''))
+            self.assertIn('COVERING INDEX idx_reactions_post_type', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+        finally:
+            conn.close()
+
+    def test_migrate_down_and_up(self):
+        """Test rolling back and reapplying migrations"""
+        self.assertTrue(run_migrations(self.db_path))
+        self.assertTrue(run_migrations(self.db_path, target_version=2))
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrator = DatabaseMigrator(conn)
+            self.assertEqual(migrator.get_current_version(), 2)
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            self.assertNotIn('post_reactions', tables)
+        finally:
+            conn.close()
+
+        self.assertTrue(run_migrations(self.db_path))
+
+    def test_failed_migration_rolls_back(self):
+        """Test that a failing migration leaves neither DDL nor a version record"""
+        def broken_up(conn):
+            conn.execute('CREATE TABLE half_done (id INTEGER)')
+            raise RuntimeError("boom")
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrator = DatabaseMigrator(conn)
+            migrator.add_migration({
+                'version': 99, 'name': 'broken', 'description': '',
+                'up': broken_up, 'down': lambda c: None, 'checksum': ''
+            })
+            self.assertFalse(migrator.migrate_to_latest())
+
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            self.assertNotIn('half_done', tables)
+            self.assertIn('post_reactions', tables)  # earlier migrations stay committed
+            self.assertEqual(migrator.get_current_version(), 5)
+            self.assertEqual(conn.isolation_level, '')
+        finally:
+            conn.close()
+
+    def test_failed_script_migration_rolls_back(self):
+        """Test that executescript-based DDL stays inside the migration transaction"""
+        def broken_up(conn):
+            _execute_script(conn, ['CREATE TABLE half_done (id INTEGER)', 'CREATE TABLE broken ('])
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrator = DatabaseMigrator(conn)
+            migrator.add_migration({
+                'version': 99, 'name': 'broken', 'description': '',
+                'up': broken_up, 'down': lambda c: None, 'checksum': ''
+            })
+            self.assertFalse(migrator.migrate_to_latest())
+
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            self.assertNotIn('half_done', tables)
+            self.assertEqual(migrator.get_current_version(), 5)
+        finally:
+            conn.close()
+
+    def test_atomic_migration_rolls_back_whole_batch(self):
+        """Test that an atomic run undoes earlier migrations when a later one fails"""
+        def broken_up(conn):
+            conn.execute('CREATE TABLE half_done (id INTEGER)')
+            raise RuntimeError("boom")
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrator = DatabaseMigrator(conn)
+            migrator.add_migration({
+                'version': 99, 'name': 'broken', 'description': '',
+                'up': broken_up, 'down': lambda c: None, 'checksum': ''
+            })
+            self.assertFalse(migrator.migrate_to_latest(atomic=True))
+
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            self.assertNotIn('half_done', tables)
+            self.assertNotIn('post_reactions', tables)  # script-based migration 004 too
+            self.assertEqual(migrator.get_current_version(), 0)
+            self.assertFalse(conn.in_transaction)
+
+            migrator.migrations.pop()
+            self.assertTrue(migrator.migrate_to_latest(atomic=True))
+            self.assertEqual(migrator.get_current_version(), 5)
+        finally:
+            conn.close()
+
+    def test_current_version_is_cached(self):
+        """Test that the schema version is read once and tracked across migrations"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrator = DatabaseMigrator(conn)
+            statements = []
+            conn.set_trace_callback(statements.append)
+
+            self.assertEqual(migrator.get_current_version(), 0)
+            self.assertEqual(migrator.get_current_version(), 0)
+            self.assertEqual(sum('MAX(version)' in sql for sql in statements), 1)
+
+            self.assertTrue(migrator.migrate_to_latest())
+            self.assertEqual(migrator.get_current_version(), 5)
+            self.assertTrue(migrator.migrate_to_version(1))
+            self.assertEqual(migrator.get_current_version(), 1)
+        finally:
+            conn.close()
+
+    def test_user_settings_columns(self):
+        """Test that migration 003 adds the settings columns with their defaults"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("INSERT INTO users (user_id, name, created_at, updated_at) VALUES ('u', 'n', 0, 0)")
+            conn.commit()
+            migrator = DatabaseMigrator(conn)
+            self.assertTrue(migrator.migrate_to_version(3))
+
+            row = conn.execute(
+                'SELECT theme, language, timezone, notification_settings FROM users').fetchone()
+            self.assertEqual(row, ('light', 'en', 'UTC', '{}'))
+
+            # Re-running on a table that already has the columns is a no-op
+            self.assertTrue(migrator.migrate_to_version(2))
+            self.assertTrue(migrator.migrate_to_version(3))
+        finally:
+            conn.close()
+
+    def test_like_count_maintained_by_triggers(self):
+        """Test that migration 005 backfills posts.like_count and keeps it current"""
+        db = LocalDatabase(self.db_path)
+        try:
+            user_id = db.create_user("Liker")
+            post_id = db.create_post(user_id, "Liked post")
+            db.create_comment(post_id, user_id, '__LIKE__')
+            db.create_comment(post_id, user_id, 'Not a like')
+
+            self.assertTrue(run_migrations(db.connection, target_version=5))
+            like_count_sql = 'SELECT like_count FROM posts WHERE post_id = ?'
+            self.assertEqual(db.connection.execute(like_count_sql, (post_id,)).fetchone()[0], 1)
+
+            db.create_comments_bulk([{'post_id': post_id, 'author_id': user_id, 'content': '__LIKE__'}] * 2)
+            self.assertEqual(db.connection.execute(like_count_sql, (post_id,)).fetchone()[0], 3)
+
+            with db.connection:
+                db.connection.execute("DELETE FROM comments WHERE content = '__LIKE__'")
+            self.assertEqual(db.connection.execute(like_count_sql, (post_id,)).fetchone()[0], 0)
+        finally:
+            db.close()
+
+    def test_existing_migrations_table_is_not_recreated(self):
+        """Test that constructing a migrator on a tracked database issues no DDL"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            DatabaseMigrator(conn)
+            statements = []
+            conn.set_trace_callback(statements.append)
+            DatabaseMigrator(conn)
+            self.assertFalse([sql for sql in statements if 'CREATE TABLE' in sql])
+        finally:
+            conn.close()
+
+    def test_checksums_detect_modified_migrations(self):
+        """Test that applied migrations are checked against their current source"""
+        self.assertTrue(run_migrations(self.db_path))
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrator = DatabaseMigrator(conn)
+            checksums = {m['version']: m['checksum'] for m in migrator.get_applied_migrations()}
+            self.assertEqual(len(checksums[2]), 64)
+            self.assertEqual(len(set(checksums.values())), 5)
+
+            # Placeholder checksums from older releases are upgraded in place
+            conn.execute("UPDATE schema_migrations SET checksum = 'def456' WHERE version = 2")
+            conn.commit()
+            self.assertTrue(migrator.migrate_to_latest())
+            self.assertEqual(migrator.get_applied_migrations()[1]['checksum'], checksums[2])
+
+            # Anything else that differs means the migration changed after it ran
+            conn.execute("UPDATE schema_migrations SET checksum = 'tampered' WHERE version = 2")
+            conn.commit()
+            self.assertFalse(migrator.migrate_to_latest())
+        finally:
+            conn.close()
+
+    def test_run_migrations_reuses_open_connection(self):
+        """Test that a caller's connection is migrated in place and left open"""
+        db = LocalDatabase(self.db_path)
+        try:
+            self.assertTrue(run_migrations(db.connection))
+            self.assertEqual(DatabaseMigrator(db.connection).get_current_version(), 5)
+            # Still usable by LocalDatabase afterwards
+            self.assertTrue(db.create_user("After migration"))
+        finally:
+            db.close()
+
+    def test_migrations_leave_caller_transaction_open(self):
+        """Test that migrating inside a caller's transaction neither commits nor ends it"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('CREATE TABLE caller_data (value TEXT)')
+            conn.execute("INSERT INTO caller_data VALUES ('pending')")
+            self.assertTrue(conn.in_transaction)
+
+            migrator = DatabaseMigrator(conn)
+            self.assertTrue(migrator.migrate_to_latest())
+            self.assertTrue(conn.in_transaction)
+            self.assertEqual(migrator.get_current_version(), 5)
+
+            # Rolling back drops the caller's pending row and the migrations with it
+            conn.rollback()
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM caller_data').fetchone()[0], 0)
+            self.assertEqual(DatabaseMigrator(conn).get_current_version(), 0)
+        finally:
+            conn.close()
+
+    def test_synchronous_relaxed_only_under_wal(self):
+        """Test that a caller's rollback-journal connection keeps synchronous=FULL"""
+        conn = sqlite3.connect(os.path.join(self.temp_dir, 'journal.db'))
+        try:
+            conn.execute('PRAGMA synchronous=FULL')
+            DatabaseMigrator(conn)
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+            self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 2)
+        finally:
+            conn.close()
+
+        # LocalDatabase put the setUp database in WAL mode
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('PRAGMA synchronous=FULL')
+            DatabaseMigrator(conn)
+            self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+        finally:
+            conn.close()
+
+    def test_run_migrations_closes_connection_when_optimize_fails(self):
+        """Test that the exclusive-mode connection is closed even if PRAGMA optimize raises"""
+        opened = []
+
+        class OptimizeFails(sqlite3.Connection):
+            def execute(self, sql, *args):
+                if sql == 'PRAGMA optimize':
+                    raise sqlite3.OperationalError("disk I/O error")
+                return super().execute(sql, *args)
+
+        def connect(db_path):
+            conn = sqlite3.connect(db_path, factory=OptimizeFails)
+            opened.append(conn)
+            return conn
+
+        with patch('database.migrations._connect', connect):
+            self.assertFalse(run_migrations(self.db_path))
+
+        with self.assertRaises(sqlite3.ProgrammingError):
+            opened[0].execute('SELECT 1')
+        # The EXCLUSIVE lock went with the connection
+        conn = sqlite3.connect(self.db_path, timeout=0)
+        try:
+            conn.execute('CREATE TABLE after_migration (id INTEGER)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def test_status_reports_gaps_as_pending(self):
+        """Test that a missing mid-version record shows up as pending"""
+        self.assertTrue(run_migrations(self.db_path))
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('DELETE FROM schema_migrations WHERE version = 2')
+            conn.commit()
+            status = DatabaseMigrator(conn).status()
+            self.assertEqual(status['current_version'], 5)
+            self.assertEqual([m['version'] for m in status['pending_migrations']], [2])
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -341,5 +341,35 @@ class TestModels(unittest.TestCase):
         media_encrypted = MediaFile(**media_data)
         self.assertTrue(media_encrypted.is_encrypted)
 
+    def test_models_use_slots(self):
+        """Test that row models carry no per-instance __dict__ but stay mutable"""
+        user = User(**self.test_user_data)
+        comment = Comment(**self.test_comment_data)
+
+        for model in (user, comment, MediaFile(**self.test_media_data)):
+            self.assertFalse(hasattr(model, '__dict__'))
+
+        user.name = 'Renamed'
+        self.assertEqual(user.name, 'Renamed')
+        with self.assertRaises(AttributeError):
+            user.nickname = 'not a field'
+
+    def test_json_fields_parse_lazily(self):
+        """Test that raw JSON column text is decoded on first access"""
+        data = self.test_post_data.copy()
+        data['metadata'] = '{"tags": ["a", "b"]}'
+        post = Post(**data)
+
+        self.assertEqual(post._metadata, '{"tags": ["a", "b"]}')
+        self.assertEqual(post.metadata, {'tags': ['a', 'b']})
+        self.assertIs(post.metadata, post.metadata)
+
+        connection_data = self.test_connection_data.copy()
+        connection_data['permissions'] = None
+        self.assertEqual(Connection(**connection_data).permissions, {})
+
+        # Raw and parsed inputs compare equal once decoded
+        self.assertEqual(Post(**data), Post(**dict(data, metadata={'tags': ['a', 'b']})))
+
 if __name__ == '__main__':
     unittest.main()
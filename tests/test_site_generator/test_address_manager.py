@@ -75,12 +75,26 @@ class TestDynamicAddressManager(unittest.TestCase):
         self.assertEqual(len(addresses), 1)
         self.assertEqual(addresses[0]['ip'], '192.168.1.100')
         
-    @patch('site_generator.address_manager.urllib.request')
-    def test_get_external_address_success(self, mock_urllib):
+    @patch('site_generator.address_manager.netifaces')
+    def test_get_local_addresses_cached_and_filtered(self, mock_netifaces):
+        """Test that virtual interfaces are skipped and scans are reused briefly"""
+        mock_netifaces.interfaces.return_value = ['docker0', 'eth0', 'veth1a2b', 'br-3f4e']
+        mock_netifaces.AF_INET = 2
+        mock_netifaces.ifaddresses.return_value = {2: [{'addr': '192.168.1.100'}]}
+        
+        addresses = self.address_manager.get_local_addresses()
+        self.assertEqual([addr['interface'] for addr in addresses], ['eth0'])
+        mock_netifaces.ifaddresses.assert_called_once_with('eth0')
+        
+        # Callers may annotate the result without affecting the cached scan
+        addresses[0]['id'] = 'x'
+        self.assertNotIn('id', self.address_manager.get_local_addresses()[0])
+        self.assertEqual(mock_netifaces.interfaces.call_count, 1)
+        
+    @patch('site_generator.address_manager._HTTP')
+    def test_get_external_address_success(self, mock_http):
         """Test getting external IP address successfully"""
-        mock_response = MagicMock()
-        mock_response.read.return_value.decode.return_value = '203.0.113.1'
-        mock_urllib.urlopen.return_value = mock_response
+        mock_http.request.return_value = MagicMock(status=200, data=b'203.0.113.1')
         
         external_addr = self.address_manager.get_external_address()
         
@@ -91,15 +105,39 @@ class TestDynamicAddressManager(unittest.TestCase):
         self.assertEqual(external_addr['url'], f'http://203.0.113.1:{self.base_port}')
         self.assertIn('timestamp', external_addr)
         
-    @patch('site_generator.address_manager.urllib.request')
-    def test_get_external_address_failure(self, mock_urllib):
+    @patch('site_generator.address_manager._HTTP')
+    def test_get_external_address_failure(self, mock_http):
         """Test handling external IP lookup failure"""
-        mock_urllib.urlopen.side_effect = Exception("Network error")
+        mock_http.request.side_effect = Exception("Network error")
         
         external_addr = self.address_manager.get_external_address()
         
         self.assertIsNone(external_addr)
         
+    @patch('site_generator.address_manager.time.monotonic')
+    @patch('site_generator.address_manager._HTTP')
+    def test_get_external_address_cached_with_backoff(self, mock_http, mock_monotonic):
+        """Test that lookups are reused within the TTL and failures back off"""
+        mock_http.request.return_value = MagicMock(status=200, data=b'203.0.113.1')
+        mock_monotonic.return_value = 1000.0
+        self.address_manager.get_external_address()
+        mock_monotonic.return_value = 1200.0
+        self.assertEqual(self.address_manager.get_external_address()['ip'], '203.0.113.1')
+        self.assertEqual(mock_http.request.call_count, 1)
+        
+        # Once the TTL runs out a failing uplink is only retried after the backoff
+        mock_http.request.side_effect = Exception("Network error")
+        mock_monotonic.return_value = 1301.0
+        self.assertIsNone(self.address_manager.get_external_address())
+        mock_monotonic.return_value = 1310.0
+        self.assertIsNone(self.address_manager.get_external_address())
+        self.assertEqual(mock_http.request.call_count, 2)
+        
+        mock_http.request.side_effect = None
+        mock_monotonic.return_value = 1332.0
+        self.assertEqual(self.address_manager.get_external_address()['ip'], '203.0.113.1')
+        self.assertEqual(mock_http.request.call_count, 3)
+        
     def test_generate_address_id(self):
         """Test address ID generation"""
         test_addresses = [
@@ -210,6 +248,11 @@ class TestDynamicAddressManager(unittest.TestCase):
                 'ip': '127.0.0.2',  # another localhost - not shareable
                 'url': 'http://127.0.0.2:8080',
                 'id': 'local3'
+            },
+            {
+                'ip': '169.254.10.20',  # link-local - not shareable
+                'url': 'http://169.254.10.20:8080',
+                'id': 'local4'
             }
         ]
         
@@ -223,6 +266,7 @@ class TestDynamicAddressManager(unittest.TestCase):
         self.assertIn('203.0.113.1', shareable_ips)
         self.assertNotIn('127.0.0.1', shareable_ips)
         self.assertNotIn('127.0.0.2', shareable_ips)
+        self.assertNotIn('169.254.10.20', shareable_ips)
         
     def test_address_history_tracking(self):
         """Test that address history is properly tracked"""
@@ -254,6 +298,13 @@ class TestDynamicAddressManager(unittest.TestCase):
                 # History should contain both addresses
                 self.assertEqual(len(self.address_manager.address_history), 2)
                 
+                # Seeing an address again (with a new timestamp) doesn't duplicate it
+                mock_local.return_value = [dict(test_addresses[0], timestamp=time.time() + 1)]
+                self.address_manager.update_current_addresses()
+                self.assertEqual(len(self.address_manager.address_history), 2)
+                mock_local.return_value = [test_addresses[1]]
+                self.address_manager.update_current_addresses()
+                
                 # Current should only have latest
                 self.assertEqual(len(self.address_manager.current_addresses), 1)
                 self.assertEqual(self.address_manager.current_addresses[0]['ip'], '192.168.1.101')
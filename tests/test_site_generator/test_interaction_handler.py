@@ -0,0 +1,87 @@
+import unittest
+import tempfile
+import shutil
+import os
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from database.local_db import LocalDatabase
+from database.migrations import run_migrations
+from site_generator.interaction_handler import InteractionHandler
+
+class TestInteractionHandler(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.database = LocalDatabase(os.path.join(self.temp_dir, 'test.db'))
+        self.assertTrue(run_migrations(self.database.connection))
+        self.handler = InteractionHandler(self.database)
+
+        self.owner_id = self.database.create_user("Owner")
+        self.liker_id = self.database.create_user("Liker")
+        self.post_id = self.database.create_post(self.owner_id, "A post")
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.database.close()
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_likes_count_follows_likes_made_elsewhere(self):
+        """Test that likes added or removed outside this handler show up in the count"""
+        self.assertTrue(self.handler.add_like(self.liker_id, self.post_id))
+        self.assertEqual(self.handler.get_post_likes_count(self.post_id), 1)
+
+        other_handler = InteractionHandler(self.database)
+        self.assertTrue(other_handler.add_like(self.owner_id, self.post_id))
+        self.assertEqual(self.handler.get_post_likes_count(self.post_id), 2)
+
+        self.assertTrue(other_handler.remove_like(self.owner_id, self.post_id))
+        self.assertEqual(self.handler.get_post_likes_count(self.post_id), 1)
+
+    def test_likes_count_for_post_not_stored_locally(self):
+        """Test that likes on a post with no posts row are still counted"""
+        self.assertTrue(self.handler.add_like(self.liker_id, 'peer-post'))
+        self.assertTrue(self.handler.add_like(self.owner_id, 'peer-post'))
+        self.assertEqual(self.handler.get_post_likes_count('peer-post'), 2)
+        self.assertEqual(self.handler.get_post_likes_count('unknown-post'), 0)
+
+    def test_rate_limit_windows_are_per_action(self):
+        """Test that likes neither use up nor reset the comment budget"""
+        parent_id = self.database.create_comment(self.post_id, self.owner_id, "Parent")
+        post_ids = [self.database.create_post(self.owner_id, f"Post {i}") for i in range(30)]
+        clock = [1000.0]
+
+        with patch('time.monotonic', side_effect=lambda: clock[0]):
+            self.assertEqual(len(self.handler.add_likes_bulk(self.liker_id, post_ids)), 30)
+            self.assertFalse(self.handler.add_like(self.liker_id, self.post_id))
+
+            clock[0] += 30
+            for i in range(10):
+                self.assertIsNotNone(self.handler.add_comment_reply(self.liker_id, parent_id, f"Reply {i}"))
+            self.assertIsNone(self.handler.add_comment_reply(self.liker_id, parent_id, "One too many"))
+
+            # The like window has expired, the comment window hasn't
+            clock[0] += 31
+            self.assertTrue(self.handler.add_like(self.liker_id, self.post_id))
+            self.assertIsNone(self.handler.add_comment_reply(self.liker_id, parent_id, "Still too many"))
+
+    def test_likes_count_without_like_count_column(self):
+        """Test that unmigrated databases count the like comments instead"""
+        database = LocalDatabase(os.path.join(self.temp_dir, 'unmigrated.db'))
+        try:
+            handler = InteractionHandler(database)
+            user_id = database.create_user("Liker")
+            post_id = database.create_post(user_id, "A post")
+            self.assertTrue(handler.add_like(user_id, post_id))
+            self.assertEqual(handler.get_post_likes_count(post_id), 1)
+        finally:
+            database.close()
+
+if __name__ == '__main__':
+    unittest.main()
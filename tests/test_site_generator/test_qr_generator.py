@@ -113,6 +113,15 @@ class TestQRCodeGenerator(unittest.TestCase):
         png_signature = b'\x89PNG\r\n\x1a\n'
         self.assertTrue(decoded.startswith(png_signature))
         
+    def test_generate_address_svg(self):
+        """Test generating inline SVG markup for address information"""
+        svg = self.qr_generator.generate_address_svg(self.test_address_info)
+
+        self.assertIsInstance(svg, str)
+        self.assertTrue(svg.startswith('<svg'))
+        self.assertTrue(svg.rstrip().endswith('</svg>'))
+        self.assertNotIn('<?xml', svg)
+
     def test_generate_contact_qr(self):
         """Test generating QR code for contact information"""
         qr_base64 = self.qr_generator.generate_contact_qr(self.test_user_info)
@@ -204,6 +213,19 @@ class TestQRCodeGenerator(unittest.TestCase):
         # Should be identical
         self.assertEqual(qr1, qr2)
         
+    def test_generated_images_are_cached(self):
+        """Test that repeat payloads reuse the encoded image until settings change"""
+        from site_generator.qr_generator import _render_qr_cached
+        _render_qr_cached.cache_clear()
+
+        qr1 = self.qr_generator.generate_qr_code("Cache test")
+        qr2 = self.qr_generator.generate_qr_code_async("Cache test").result(timeout=5)
+        self.assertEqual(qr1, qr2)
+        self.assertEqual(_render_qr_cached.cache_info().hits, 1)
+
+        self.qr_generator.qr_settings['box_size'] = 5
+        self.assertNotEqual(self.qr_generator.generate_qr_code("Cache test"), qr1)
+
     def test_different_data_different_qr(self):
         """Test that different data produces different QR codes"""
         data1 = "First data set"
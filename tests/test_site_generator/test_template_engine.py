@@ -235,6 +235,65 @@ class TestSiteTemplateEngine(unittest.TestCase):
         for post in self.test_posts:
             self.assertIn(f'<li>{post["content"]}</li>', rendered)
             
+    def test_compiled_templates_are_cached(self):
+        """Test that compiled templates persist on disk and are reused across engines"""
+        self.template_engine.generate_user_site(self.test_user_data, self.test_posts)
+        cache_dir = Path(self.temp_dir) / '.jinja_cache'
+        self.assertTrue(any(cache_dir.iterdir()))
+
+        # A fresh engine renders the same page from the bytecode cache
+        new_engine = SiteTemplateEngine(self.temp_dir)
+        self.assertEqual(
+            new_engine.generate_user_site(self.test_user_data, self.test_posts),
+            self.template_engine.generate_user_site(self.test_user_data, self.test_posts)
+        )
+
+    def test_running_engine_picks_up_template_edits(self):
+        """Test that an edited template is used on the next render"""
+        template_path = Path(self.temp_dir) / 'note.html'
+        template_path.write_text('<p>{{ text }}</p>')
+        self.assertEqual(self.template_engine.render_page('note.html', {'text': 'hi'}), '<p>hi</p>')
+
+        template_path.write_text('<div>{{ text }}</div>')
+        # Jinja notices edits by mtime, so keep both writes from landing on one timestamp tick
+        mtime = os.stat(template_path).st_mtime
+        os.utime(template_path, (mtime + 1, mtime + 1))
+        self.assertEqual(self.template_engine.render_page('note.html', {'text': 'hi'}), '<div>hi</div>')
+
+    def test_write_user_site_streams_to_file(self):
+        """Test that the streamed site matches the rendered one and escapes content"""
+        output_path = Path(self.temp_dir) / 'site.html'
+        self.template_engine.write_user_site(self.test_user_data, self.test_posts, output_path)
+        self.assertEqual(
+            output_path.read_text(encoding='utf-8'),
+            self.template_engine.generate_user_site(self.test_user_data, self.test_posts)
+        )
+
+        posts = [dict(self.test_posts[0], content='<script>alert(1)</script>')]
+        rendered_site = ''.join(
+            self.template_engine.render_page_stream('index.html', {
+                'user': self.test_user_data, 'posts': posts
+            })
+        )
+        self.assertNotIn('<script>', rendered_site)
+        self.assertIn('&lt;script&gt;', rendered_site)
+
+    def test_post_markup_is_escaped_once(self):
+        """Test that markup in a post body is shown as text, and trusted Markup is not escaped"""
+        from markupsafe import Markup
+
+        posts = [dict(self.test_posts[0], content='<b>Bold</b> & "quoted"', comments=[])]
+        rendered_site = self.template_engine.generate_user_site(self.test_user_data, posts)
+        self.assertIn(
+            '<div class="post-content">&lt;b&gt;Bold&lt;/b&gt; &amp; &#34;quoted&#34;</div>',
+            rendered_site
+        )
+        self.assertNotIn('&amp;lt;', rendered_site)
+
+        posts = [dict(self.test_posts[0], content=Markup('<em>Trusted</em>'), comments=[])]
+        rendered_site = self.template_engine.generate_user_site(self.test_user_data, posts)
+        self.assertIn('<div class="post-content"><em>Trusted</em></div>', rendered_site)
+
     def test_template_css_styling(self):
         """Test that default templates include CSS styling"""
         rendered_site = self.template_engine.generate_user_site(
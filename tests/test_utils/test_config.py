@@ -172,6 +172,37 @@ class TestConfig(unittest.TestCase):
         self.assertIsNotNone(config.get('web_port'))
         self.assertIsNotNone(config.get('p2p_port'))
         
+    def test_config_file_parsed_once_until_modified(self):
+        """Test that unchanged config files are served from the parse cache"""
+        from unittest.mock import patch
+        config_module = sys.modules[Config.__module__]
+
+        config1 = Config(self.temp_config_file.name)
+        with patch.object(config_module, '_loads', wraps=config_module._loads) as loads:
+            config2 = Config(self.temp_config_file.name)
+            self.assertEqual(loads.call_count, 0)
+
+            # Instances don't share mutations through the cached data, nested values included
+            config2.set('web_port', 9000)
+            config2.get('encryption')['algorithm'] = 'none'
+            config2.get('registry')['urls'].append('https://evil.example.com')
+            self.assertEqual(config1.get('web_port'), 8080)
+            fresh = Config(self.temp_config_file.name)
+            self.assertEqual(fresh.get('web_port'), 8080)
+            self.assertEqual(fresh.get('encryption'), self.test_config['encryption'])
+            self.assertEqual(fresh.get('registry'), self.test_config['registry'])
+
+            # An outside rewrite is picked up without the mtime having to move on
+            with open(self.temp_config_file.name, 'w') as f:
+                json.dump({'web_port': 8181}, f)
+            self.assertEqual(Config(self.temp_config_file.name).get('web_port'), 8181)
+            self.assertEqual(loads.call_count, 1)
+
+        # So is a save() followed straight away by a reload
+        config1.set('web_port', 8282)
+        self.assertTrue(config1.save())
+        self.assertEqual(Config(self.temp_config_file.name).get('web_port'), 8282)
+
     def test_config_environment_variable_override(self):
         """Test config values can be overridden by environment variables"""
         config = Config(self.temp_config_file.name)
@@ -3,10 +3,44 @@
 Configuration management for Decentralized Social Media Platform
 """
 
+import copy
+import functools
 import json
 import os
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Mapping, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    orjson = None
+
+_loads = orjson.loads if orjson else json.loads
+
+def _dump_config(path, data: Mapping[str, Any]) -> None:
+    """Write a config mapping as indented, key-sorted JSON in one write"""
+    if orjson:
+        blob = orjson.dumps(dict(data), option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+    else:
+        blob = json.dumps(data, indent=2, sort_keys=True).encode('utf-8')
+    Path(path).write_bytes(blob)
+    # A rewrite can land within the same mtime tick, so don't trust the stat key for our own writes
+    _load_config_cached.cache_clear()
+
+@functools.lru_cache(maxsize=8)
+def _load_config_cached(path: str, mtime_ns: int, size: int, inode: int) -> Dict[str, Any]:
+    """Parse a config file once per (path, mtime, size, inode); never hand this object out"""
+    with open(path, 'rb') as f:
+        return _loads(f.read())
+
+def read_config_file(config_path) -> Dict[str, Any]:
+    """Return the parsed contents of a config file, re-reading only after it changes
+    
+    Each call gets its own deep copy, so callers may modify nested values freely.
+    """
+    path = os.fspath(config_path)
+    stat = os.stat(path)
+    return copy.deepcopy(_load_config_cached(path, stat.st_mtime_ns, stat.st_size, stat.st_ino))
 
 class Config:
     """Configuration manager with JSON file support"""
@@ -35,10 +69,9 @@ class Config:
         """Load configuration from file or create default"""
         if self.config_path.exists():
             try:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    self.config_data = json.load(f)
+                self.config_data = read_config_file(self.config_path)
                 print(f"Configuration loaded from: {self.config_path}")
-            except (json.JSONDecodeError, IOError) as e:
+            except (ValueError, IOError) as e:
                 print(f"Warning: Could not load config from {self.config_path}: {e}")
                 print("Using default configuration")
                 self.config_data = {}
@@ -54,8 +87,7 @@ class Config:
             self.config_path.parent.mkdir(parents=True, exist_ok=True)
             
             # Save defaults to file
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.defaults, f, indent=2, sort_keys=True)
+            _dump_config(self.config_path, self.defaults)
             print(f"Default configuration saved to: {self.config_path}")
         except IOError as e:
             print(f"Warning: Could not save default config: {e}")
@@ -76,8 +108,7 @@ class Config:
             complete_config = self.defaults.copy()
             complete_config.update(self.config_data)
             
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(complete_config, f, indent=2, sort_keys=True)
+            _dump_config(self.config_path, complete_config)
             return True
         except IOError as e:
             print(f"Error saving configuration: {e}")
@@ -15,6 +15,11 @@ from pathlib import Path
 from typing import List, Dict, Optional, Tuple, Union
 import uuid
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    orjson = None
+
 class SafeFileHandler:
     """Safe file operations with sandboxing"""
     
@@ -359,6 +364,10 @@ class ConfigFileManager:
     def load_json_config(file_path: Union[str, Path]) -> Dict:
         """Load JSON configuration file"""
         try:
+            if orjson:
+                # orjson.JSONDecodeError subclasses json.JSONDecodeError
+                with open(file_path, 'rb') as f:
+                    return orjson.loads(f.read())
             with open(file_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except (FileNotFoundError, json.JSONDecodeError) as e:
@@ -369,8 +378,14 @@ class ConfigFileManager:
     def save_json_config(file_path: Union[str, Path], config: Dict) -> bool:
         """Save configuration to JSON file"""
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, sort_keys=True)
+            if orjson:
+                Path(file_path).write_bytes(orjson.dumps(
+                    config,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                ))
+            else:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(config, f, indent=2, sort_keys=True)
             return True
         except Exception as e:
             print(f"Error saving config to {file_path}: {e}")